@@ -0,0 +1,48 @@
+from django.contrib import admin
+
+from generic_m2m_field.admin import GenericManyToManyAdminMixin, GenericManyToManyInline
+
+from apps.app.models import CountedGenericManyToManyModel, GenericManyToManyModel, NamedGenericManyToManyModel
+
+
+class GenericManyToManyModelInline(GenericManyToManyInline):
+
+    model = GenericManyToManyModel.related_objects.through
+    per_page = 2
+    autocomplete_models = {
+        'app.OneRelatedObject': ('id',),
+        'app.SecondRelatedObject': ('id',),
+    }
+    autocomplete_limit = 2
+
+
+@admin.register(GenericManyToManyModel)
+class GenericManyToManyModelAdmin(GenericManyToManyAdminMixin, admin.ModelAdmin):
+
+    inlines = (GenericManyToManyModelInline,)
+
+
+class NamedGenericManyToManyModelInline(GenericManyToManyInline):
+
+    model = NamedGenericManyToManyModel.related_objects.through
+
+
+@admin.register(NamedGenericManyToManyModel)
+class NamedGenericManyToManyModelAdmin(GenericManyToManyAdminMixin, admin.ModelAdmin):
+
+    inlines = (NamedGenericManyToManyModelInline,)
+
+
+class CountedGenericManyToManyModelInline(GenericManyToManyInline):
+
+    model = CountedGenericManyToManyModel.related_objects.through
+    autocomplete_models = {
+        'app.OneRelatedObject': ('id',),
+    }
+
+
+@admin.register(CountedGenericManyToManyModel)
+class CountedGenericManyToManyModelAdmin(GenericManyToManyAdminMixin, admin.ModelAdmin):
+
+    inlines = (CountedGenericManyToManyModelInline,)
+    readonly_fields = ('related_count', 'related_one_count')
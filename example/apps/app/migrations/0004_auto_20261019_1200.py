@@ -0,0 +1,61 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('app', '0003_auto_20210604_1406'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountedGenericManyToManyModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('related_count', models.PositiveIntegerField(default=0)),
+                ('related_one_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CountedNamedGenericManyToManyModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('related_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CountedNamedGenericManyToManyModelGenericManyToManyRelation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='created at')),
+                ('changed_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='changed at')),
+                ('object_id', models.TextField(db_index=True, verbose_name='ID of the related object')),
+                ('name', models.CharField(db_index=True, max_length=200, verbose_name='name')),
+                ('counted_named_generic_many_to_many_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='_related_objects', related_query_name='related_objects', to='app.countednamedgenericmanytomanymodel')),
+                ('object_ct', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='content type of the related object')),
+            ],
+            options={
+                'db_tablespace': '',
+                'unique_together': {('counted_named_generic_many_to_many_model', 'name')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CountedGenericManyToManyModelGenericManyToManyRelation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='created at')),
+                ('changed_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='changed at')),
+                ('object_id', models.TextField(db_index=True, verbose_name='ID of the related object')),
+                ('counted_generic_many_to_many_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='_related_objects', related_query_name='related_objects', to='app.countedgenericmanytomanymodel')),
+                ('object_ct', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='content type of the related object')),
+            ],
+            options={
+                'db_tablespace': '',
+                'unique_together': {('counted_generic_many_to_many_model', 'object_ct', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('app', '0004_auto_20261019_1200'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderedGenericManyToManyModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderedGenericManyToManyModelGenericManyToManyRelation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='created at')),
+                ('changed_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='changed at')),
+                ('object_id', models.TextField(db_index=True, verbose_name='ID of the related object')),
+                ('position', models.BigIntegerField(default=0, verbose_name='position')),
+                ('object_ct', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='content type of the related object')),
+                ('ordered_generic_many_to_many_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='_related_objects', related_query_name='related_objects', to='app.orderedgenericmanytomanymodel')),
+            ],
+            options={
+                'ordering': ('position', 'pk'),
+                'db_tablespace': '',
+                'unique_together': {('ordered_generic_many_to_many_model', 'object_ct', 'object_id')},
+                'index_together': {('ordered_generic_many_to_many_model', 'position')},
+            },
+        ),
+    ]
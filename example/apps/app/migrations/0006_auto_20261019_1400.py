@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-19 14:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_auto_20261019_1300'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DedicatedDBGenericManyToManyModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DedicatedDBGenericManyToManyModelGenericManyToManyRelation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='created at')),
+                ('changed_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='changed at')),
+                ('object_ct_id', models.PositiveSmallIntegerField(db_index=True, verbose_name='content type of the related object')),
+                ('object_id', models.TextField(db_index=True, verbose_name='ID of the related object')),
+                ('dedicated_db_generic_many_to_many_model', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='_related_objects', related_query_name='related_objects', to='app.dedicateddbgenericmanytomanymodel')),
+            ],
+            options={
+                'db_tablespace': '',
+                'unique_together': {('dedicated_db_generic_many_to_many_model', 'object_ct_id', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('app', '0006_auto_20261019_1400'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='countedgenericmanytomanymodelgenericmanytomanyrelation',
+            index_together={('object_ct', 'object_id')},
+        ),
+        migrations.AlterIndexTogether(
+            name='countednamedgenericmanytomanymodelgenericmanytomanyrelation',
+            index_together={('object_ct', 'object_id')},
+        ),
+        migrations.AlterIndexTogether(
+            name='dedicateddbgenericmanytomanymodelgenericmanytomanyrelation',
+            index_together={('object_ct_id', 'object_id')},
+        ),
+        migrations.AlterIndexTogether(
+            name='genericmanytomanymodelgenericmanytomanyrelation',
+            index_together={('object_ct', 'object_id')},
+        ),
+        migrations.AlterIndexTogether(
+            name='multipledbgenericmanytomanymodelgenericmanytomanyrelation',
+            index_together={('object_ct_id', 'object_id')},
+        ),
+        migrations.AlterIndexTogether(
+            name='namedgenericmanytomanymodelgenericmanytomanyrelation',
+            index_together={('object_ct', 'object_id')},
+        ),
+        migrations.AlterIndexTogether(
+            name='orderedgenericmanytomanymodelgenericmanytomanyrelation',
+            index_together={('ordered_generic_many_to_many_model', 'position'), ('object_ct', 'object_id')},
+        ),
+    ]
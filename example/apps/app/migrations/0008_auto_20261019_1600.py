@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_auto_20261019_1500'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dedicateddbgenericmanytomanymodelgenericmanytomanyrelation',
+            name='dedicated_db_generic_many_to_many_model',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='_related_objects', related_query_name='+', to='app.dedicateddbgenericmanytomanymodel'),
+        ),
+    ]
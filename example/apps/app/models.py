@@ -1,13 +1,14 @@
 from django.db import models
 
 from generic_m2m_field.models import (
-    GenericManyToManyField, MultipleDBGenericManyToManyField, NamedGenericManyToManyField
+    GenericManyToManyField, MultipleDBGenericManyToManyField, NamedGenericManyToManyField,
+    OrderedGenericManyToManyField
 )
 
 
 class GenericManyToManyModel(models.Model):
 
-    related_objects = GenericManyToManyField()
+    related_objects = GenericManyToManyField(track_changes=True)
 
 
 class MultipleDBGenericManyToManyModel(models.Model):
@@ -15,9 +16,14 @@ class MultipleDBGenericManyToManyModel(models.Model):
     related_objects = MultipleDBGenericManyToManyField()
 
 
+class DedicatedDBGenericManyToManyModel(models.Model):
+
+    related_objects = MultipleDBGenericManyToManyField(using='relations', track_changes=True)
+
+
 class NamedGenericManyToManyModel(models.Model):
 
-    related_objects = NamedGenericManyToManyField()
+    related_objects = NamedGenericManyToManyField(track_changes=True)
 
 
 class OneRelatedObject(models.Model):
@@ -27,3 +33,23 @@ class OneRelatedObject(models.Model):
 class SecondRelatedObject(models.Model):
 
     id = models.CharField(primary_key=True, max_length=10)
+
+
+class CountedGenericManyToManyModel(models.Model):
+
+    related_count = models.PositiveIntegerField(default=0)
+    related_one_count = models.PositiveIntegerField(default=0)
+    related_objects = GenericManyToManyField(
+        count_field='related_count', model_count_fields={'app.OneRelatedObject': 'related_one_count'}
+    )
+
+
+class CountedNamedGenericManyToManyModel(models.Model):
+
+    related_count = models.PositiveIntegerField(default=0)
+    related_objects = NamedGenericManyToManyField(count_field='related_count')
+
+
+class OrderedGenericManyToManyModel(models.Model):
+
+    related_objects = OrderedGenericManyToManyField()
@@ -1,16 +1,39 @@
-from django.core.exceptions import MultipleObjectsReturned
-
-from germanium.test_cases.default import GermaniumTestCase
-from germanium.tools import assert_equal, assert_is_none, assert_raises
+import random
+import threading
+import time
+
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldError, MultipleObjectsReturned
+from django.core.management import call_command
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.conf import settings
+from django.test import TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from germanium.test_cases.default import GermaniumTestCase, GermaniumTestCaseMixin
+from germanium.tools import assert_equal, assert_false, assert_is_none, assert_raises, assert_true
+
+from generic_m2m_field.batch import generic_m2m_batch
+from generic_m2m_field.models import GenericManyToManyTombstone, RelatedObjectRef, retarget, retarget_many
+from generic_m2m_field.operations import PartitionGenericManyToManyRelations
+from generic_m2m_field.signals import post_add, post_clear, post_remove, pre_add, pre_clear, pre_remove
 
 from apps.app.models import (
     GenericManyToManyModel, MultipleDBGenericManyToManyModel, OneRelatedObject, SecondRelatedObject,
-    NamedGenericManyToManyModel
+    NamedGenericManyToManyModel, CountedGenericManyToManyModel, CountedNamedGenericManyToManyModel,
+    OrderedGenericManyToManyModel, DedicatedDBGenericManyToManyModel
 )
 
 
 class GenericManyToManyTestCase(GermaniumTestCase):
 
+    databases = {'default', 'relations'}
+
     def test_generic_m2m_should_add_related_object(self):
         m2m_inst = GenericManyToManyModel.objects.create()
         related_object_inst1 = OneRelatedObject.objects.create()
@@ -306,3 +329,1009 @@ class GenericManyToManyTestCase(GermaniumTestCase):
             related_object1=related_object_inst1,
             related_object2=related_object_inst2
         ))
+
+    def test_generic_m2m_manager_should_return_object_refs_without_target_query(self):
+        m2m_inst = GenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+
+        m2m_inst.related_objects.add(related_object_inst1, related_object_inst2)
+
+        with self.assertNumQueries(1):
+            refs = m2m_inst.related_objects.order_by('pk').refs()
+        assert_equal(refs, [
+            RelatedObjectRef('app.OneRelatedObject', related_object_inst1.pk),
+            RelatedObjectRef('app.SecondRelatedObject', 'unique'),
+        ])
+        assert_equal(refs[0].model_class, OneRelatedObject)
+
+        m2m_inst.related_objects.remove(refs[1])
+        assert_equal(m2m_inst.related_objects.count(), 1)
+
+    def test_generic_m2m_manager_should_return_projected_objects(self):
+        m2m_inst = GenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+
+        m2m_inst.related_objects.add(related_object_inst1)
+
+        related_object = m2m_inst.related_objects.get_objects(OneRelatedObject, fields=['id']).get()
+        assert_equal(related_object, related_object_inst1)
+        assert_equal(related_object.get_deferred_fields(), set())
+
+        content_type = ContentType.objects.get_for_model(OneRelatedObject)
+        m2m_inst.related_objects.add(content_type)
+        projected_content_type = m2m_inst.related_objects.get_objects(ContentType, fields=['app_label']).get()
+        assert_equal(projected_content_type, content_type)
+        assert_equal(projected_content_type.get_deferred_fields(), {'model'})
+        [(_, resolved_content_type)] = m2m_inst.related_objects.filter(
+            object_ct_id=ContentType.objects.get_for_model(ContentType).pk
+        ).resolve_objects(fields={ContentType: ['model']})
+        assert_equal(resolved_content_type.get_deferred_fields(), {'app_label'})
+
+    def test_named_generic_m2m_should_resolve_dict_of_related_objects_with_one_query_per_model(self):
+        m2m_inst = NamedGenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+        related_object_inst3 = OneRelatedObject.objects.create()
+
+        m2m_inst.related_objects.add(
+            related_object1=related_object_inst1,
+            related_object2=related_object_inst2,
+            related_object3=related_object_inst3,
+        )
+        with self.assertNumQueries(3):
+            assert_equal(m2m_inst.related_objects.to_dict(fields={SecondRelatedObject: ['id']}), dict(
+                related_object1=related_object_inst1,
+                related_object2=related_object_inst2,
+                related_object3=related_object_inst3,
+            ))
+
+    def test_generic_m2m_manager_should_return_objects_map_according_to_model_classes(self):
+        m2m_inst = GenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+        related_object_inst3 = OneRelatedObject.objects.create()
+
+        m2m_inst.related_objects.add(related_object_inst1, related_object_inst2, related_object_inst3)
+
+        with self.assertNumQueries(1):
+            assert_equal(
+                m2m_inst.related_objects.get_object_pks_map(OneRelatedObject, SecondRelatedObject),
+                {
+                    OneRelatedObject: [related_object_inst1.pk, related_object_inst3.pk],
+                    SecondRelatedObject: ['unique'],
+                }
+            )
+        with self.assertNumQueries(3):
+            assert_equal(
+                m2m_inst.related_objects.get_objects_map(OneRelatedObject, SecondRelatedObject),
+                {
+                    OneRelatedObject: [related_object_inst1, related_object_inst3],
+                    SecondRelatedObject: [related_object_inst2],
+                }
+            )
+        assert_equal(
+            m2m_inst.related_objects.get_objects_map(SecondRelatedObject),
+            {SecondRelatedObject: [related_object_inst2]}
+        )
+
+    def test_generic_m2m_batch_should_write_merged_relation_changes_on_exit(self):
+        m2m_inst = GenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+        related_object_inst3 = OneRelatedObject.objects.create()
+
+        m2m_inst.related_objects.add(related_object_inst1)
+        kept_relation_pk = m2m_inst.related_objects.get().pk
+
+        with generic_m2m_batch():
+            m2m_inst.related_objects.add(related_object_inst2, related_object_inst3)
+            m2m_inst.related_objects.remove(related_object_inst2, related_object_inst1)
+            m2m_inst.related_objects.add(related_object_inst1)
+            assert_equal(m2m_inst.related_objects.count(), 1)
+
+        assert_equal(
+            set(m2m_inst.related_objects.values_list('object_id', flat=True)),
+            {str(related_object_inst1.pk), str(related_object_inst3.pk)}
+        )
+        assert_equal(m2m_inst.related_objects.get(object=related_object_inst1).pk, kept_relation_pk)
+
+        with generic_m2m_batch():
+            m2m_inst.related_objects.set(related_object_inst1, related_object_inst2)
+        assert_equal(
+            set(m2m_inst.related_objects.values_list('object_id', flat=True)),
+            {str(related_object_inst1.pk), 'unique'}
+        )
+        assert_equal(m2m_inst.related_objects.get(object=related_object_inst1).pk, kept_relation_pk)
+
+    def test_generic_m2m_batch_should_discard_relation_changes_on_exception(self):
+        m2m_inst = GenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+
+        with assert_raises(ValueError):
+            with generic_m2m_batch():
+                m2m_inst.related_objects.add(related_object_inst1)
+                raise ValueError
+        assert_equal(m2m_inst.related_objects.count(), 0)
+
+    def test_named_generic_m2m_batch_should_write_merged_relation_changes_on_exit(self):
+        m2m_inst = NamedGenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+        related_object_inst3 = OneRelatedObject.objects.create()
+
+        m2m_inst.related_objects.add(related_object1=related_object_inst1, related_object2=related_object_inst2)
+
+        with generic_m2m_batch():
+            m2m_inst.related_objects.add(related_object1=related_object_inst3, related_object3=related_object_inst3)
+            m2m_inst.related_objects.remove('related_object2', 'related_object3')
+            m2m_inst.related_objects.add(related_object4=related_object_inst2)
+
+        assert_equal(m2m_inst.related_objects.to_dict(), dict(
+            related_object1=related_object_inst3,
+            related_object4=related_object_inst2,
+        ))
+
+    def test_generic_m2m_manager_should_return_keyset_paginated_related_objects(self):
+        m2m_inst = GenericManyToManyModel.objects.create()
+        related_object_insts = [OneRelatedObject.objects.create() for _ in range(5)]
+        related_object_inst = SecondRelatedObject.objects.create(id='unique')
+
+        m2m_inst.related_objects.add(*related_object_insts)
+        m2m_inst.related_objects.add(related_object_inst)
+
+        page = m2m_inst.related_objects.page(limit=2)
+        assert_equal([obj for _, obj in page.items], [related_object_inst, related_object_insts[4]])
+
+        with self.assertNumQueries(2):
+            page = m2m_inst.related_objects.page(after=page.next_cursor, limit=2)
+        assert_equal([obj for _, obj in page.items], related_object_insts[3:1:-1])
+
+        page = m2m_inst.related_objects.page(after=page.next_cursor, limit=2)
+        assert_equal([obj for _, obj in page.items], related_object_insts[1::-1])
+        assert_is_none(page.next_cursor)
+
+        page = m2m_inst.related_objects.page(limit=10, model_classes=[SecondRelatedObject])
+        assert_equal([obj for _, obj in page.items], [related_object_inst])
+        assert_is_none(page.next_cursor)
+
+        with assert_raises(ValueError):
+            m2m_inst.related_objects.page(after='invalid')
+        with assert_raises(ValueError):
+            m2m_inst.related_objects.page(limit=0)
+
+    def test_generic_m2m_should_keep_related_object_counters_in_sync(self):
+        m2m_inst = CountedGenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+        related_object_inst3 = OneRelatedObject.objects.create()
+
+        def assert_counters(related_count, related_one_count):
+            m2m_inst.refresh_from_db()
+            assert_equal(m2m_inst.related_count, related_count)
+            assert_equal(m2m_inst.related_one_count, related_one_count)
+
+        m2m_inst.related_objects.add(related_object_inst1, related_object_inst2)
+        assert_counters(2, 1)
+        m2m_inst.related_objects.add(related_object_inst1, related_object_inst3)
+        assert_counters(3, 2)
+        m2m_inst.related_objects.remove(related_object_inst1, related_object_inst1)
+        assert_counters(2, 1)
+        m2m_inst.related_objects.set(related_object_inst1, related_object_inst2)
+        assert_counters(2, 1)
+        m2m_inst.related_objects.clear()
+        assert_counters(0, 0)
+
+        with generic_m2m_batch():
+            m2m_inst.related_objects.add(related_object_inst1, related_object_inst2, related_object_inst3)
+            m2m_inst.related_objects.remove(related_object_inst3)
+        assert_counters(2, 1)
+
+    def test_named_generic_m2m_should_keep_related_object_counter_in_sync(self):
+        m2m_inst = CountedNamedGenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+
+        def assert_counter(related_count):
+            m2m_inst.refresh_from_db()
+            assert_equal(m2m_inst.related_count, related_count)
+
+        m2m_inst.related_objects.add(related_object1=related_object_inst1, related_object2=related_object_inst2)
+        assert_counter(2)
+        m2m_inst.related_objects.add(related_object1=related_object_inst2, related_object3=related_object_inst1)
+        assert_counter(3)
+        m2m_inst.related_objects.remove('related_object1', 'unknown')
+        assert_counter(2)
+        m2m_inst.related_objects.set(related_object3=related_object_inst1)
+        assert_counter(1)
+
+    def test_recompute_generic_m2m_counters_command_should_fix_drifted_counters(self):
+        m2m_insts = [CountedGenericManyToManyModel.objects.create() for _ in range(3)]
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+
+        m2m_insts[0].related_objects.add(related_object_inst1, related_object_inst2)
+        m2m_insts[1].related_objects.add(related_object_inst2)
+        CountedGenericManyToManyModel.objects.update(related_count=10, related_one_count=10)
+
+        call_command(
+            'recompute_generic_m2m_counters', 'app.CountedGenericManyToManyModel', chunk_size=2, stdout=StringIO()
+        )
+        assert_equal(
+            list(CountedGenericManyToManyModel.objects.order_by('pk').values_list(
+                'related_count', 'related_one_count'
+            )),
+            [(2, 1), (1, 0), (0, 0)]
+        )
+
+    def test_partition_operation_should_generate_list_partition_per_content_type(self):
+        through = GenericManyToManyModel.related_objects.through
+        table = through._meta.db_table
+        object_ct_id = ContentType.objects.get_for_model(OneRelatedObject).pk
+        statements = PartitionGenericManyToManyRelations(
+            through._meta.model_name, ['app.OneRelatedObject']
+        ).get_partition_sql(connection.schema_editor(), through, [(object_ct_id, OneRelatedObject)])
+
+        assert_true('CREATE TABLE "{}" (LIKE "{}_old" INCLUDING DEFAULTS) PARTITION BY LIST ("object_ct_id")'.format(
+            table, table
+        ) in statements)
+        # Partitions are named by the app label too, models with the same name can be in several apps
+        assert_true('CREATE TABLE "{}_app_onerelatedobject" PARTITION OF "{}" FOR VALUES IN ({})'.format(
+            table, table, object_ct_id
+        ) in statements)
+        assert_true(
+            'CREATE INDEX "{}_app_onerelatedobject_pk" ON "{}_app_onerelatedobject" (("object_id"::integer))'.format(
+                table, table
+            ) in statements
+        )
+        assert_true('CREATE TABLE "{}_default" PARTITION OF "{}" DEFAULT'.format(table, table) in statements)
+
+        with assert_raises(ValueError):
+            PartitionGenericManyToManyRelations(
+                NamedGenericManyToManyModel.related_objects.through._meta.model_name, ['app.OneRelatedObject']
+            ).get_partition_sql(
+                connection.schema_editor(),
+                NamedGenericManyToManyModel.related_objects.through,
+                [(object_ct_id, OneRelatedObject)]
+            )
+
+    def test_ordered_generic_m2m_should_keep_order_of_related_objects(self):
+        m2m_inst = OrderedGenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+        related_object_inst3 = OneRelatedObject.objects.create()
+        related_object_inst4 = OneRelatedObject.objects.create()
+
+        def get_related_objects():
+            return [obj for _, obj in m2m_inst.related_objects.resolve_objects()]
+
+        m2m_inst.related_objects.add(related_object_inst1, related_object_inst2)
+        m2m_inst.related_objects.add(related_object_inst3, related_object_inst1)
+        assert_equal(get_related_objects(), [related_object_inst1, related_object_inst2, related_object_inst3])
+
+        m2m_inst.related_objects.insert_at(1, related_object_inst4)
+        assert_equal(
+            get_related_objects(),
+            [related_object_inst1, related_object_inst4, related_object_inst2, related_object_inst3]
+        )
+
+        positions = dict(m2m_inst.related_objects.values_list('object_id', 'position'))
+        m2m_inst.related_objects.move(related_object_inst3, 0)
+        assert_equal(
+            get_related_objects(),
+            [related_object_inst3, related_object_inst1, related_object_inst4, related_object_inst2]
+        )
+        # Only the moved relation was changed
+        new_positions = dict(m2m_inst.related_objects.values_list('object_id', 'position'))
+        assert_equal(
+            {object_id for object_id, position in new_positions.items() if positions[object_id] != position},
+            {str(related_object_inst3.pk)}
+        )
+
+        m2m_inst.related_objects.insert_at(10, related_object_inst3)
+        assert_equal(
+            get_related_objects(),
+            [related_object_inst1, related_object_inst4, related_object_inst2, related_object_inst3]
+        )
+
+        m2m_inst.related_objects.set(related_object_inst2, related_object_inst1)
+        assert_equal(get_related_objects(), [related_object_inst2, related_object_inst1])
+
+        with assert_raises(ValueError):
+            m2m_inst.related_objects.move(related_object_inst3, 0)
+
+    def test_ordered_generic_m2m_should_copy_relations_after_relations_of_parent(self):
+        m2m_inst1, m2m_inst2 = [OrderedGenericManyToManyModel.objects.create() for _ in range(2)]
+        related_object_inst1, related_object_inst2, related_object_inst3 = [
+            OneRelatedObject.objects.create() for _ in range(3)
+        ]
+
+        m2m_inst1.related_objects.add(related_object_inst1, related_object_inst2)
+        m2m_inst2.related_objects.add(related_object_inst3)
+        m2m_inst1.related_objects.copy_to(m2m_inst2)
+        assert_equal(
+            [obj for _, obj in m2m_inst2.related_objects.resolve_objects()],
+            [related_object_inst3, related_object_inst1, related_object_inst2]
+        )
+        positions = list(m2m_inst2.related_objects.values_list('position', flat=True))
+        assert_equal(len(set(positions)), 3)
+
+    def test_ordered_generic_m2m_should_write_batched_changes_before_move(self):
+        m2m_inst = OrderedGenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = OneRelatedObject.objects.create()
+        related_object_inst3 = OneRelatedObject.objects.create()
+
+        with generic_m2m_batch():
+            m2m_inst.related_objects.add(related_object_inst1, related_object_inst2)
+            m2m_inst.related_objects.insert_at(1, related_object_inst3)
+            m2m_inst.related_objects.move(related_object_inst1, 2)
+            m2m_inst.related_objects.remove(related_object_inst2)
+            assert_equal(m2m_inst.related_objects.count(), 3)
+        assert_equal(
+            [obj for _, obj in m2m_inst.related_objects.resolve_objects()],
+            [related_object_inst3, related_object_inst1]
+        )
+
+    def test_ordered_generic_m2m_should_rebalance_positions_when_gap_is_exhausted(self):
+        m2m_inst = OrderedGenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = OneRelatedObject.objects.create()
+        inserted_related_objects = [OneRelatedObject.objects.create() for _ in range(20)]
+
+        m2m_inst.related_objects.add(related_object_inst1, related_object_inst2)
+        for related_object_inst in inserted_related_objects:
+            m2m_inst.related_objects.insert_at(1, related_object_inst)
+
+        assert_equal(
+            [obj for _, obj in m2m_inst.related_objects.resolve_objects()],
+            [related_object_inst1] + inserted_related_objects[::-1] + [related_object_inst2]
+        )
+
+    def test_generic_m2m_field_should_return_changes_since_token(self):
+        field = GenericManyToManyModel.related_objects.field
+        m2m_inst = GenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+        one_ct_id = ContentType.objects.get_for_model(OneRelatedObject).pk
+        second_ct_id = ContentType.objects.get_for_model(SecondRelatedObject).pk
+
+        m2m_inst.related_objects.add(related_object_inst1, related_object_inst2)
+        page = field.changes_since(limit=1)
+        assert_equal(
+            [(change.action, change.parent_pk, change.object_ct_id, change.object_id) for change in page.changes],
+            [('insert', m2m_inst.pk, one_ct_id, str(related_object_inst1.pk))]
+        )
+        page = field.changes_since(page.next_token)
+        assert_equal(
+            [(change.action, change.object_ct_id, change.object_id) for change in page.changes],
+            [('insert', second_ct_id, 'unique')]
+        )
+
+        m2m_inst.related_objects.remove(related_object_inst1)
+        page = field.changes_since(page.next_token)
+        assert_equal(
+            [(change.action, change.parent_pk, change.object_ct_id, change.object_id) for change in page.changes],
+            [('delete', m2m_inst.pk, one_ct_id, str(related_object_inst1.pk))]
+        )
+        assert_equal(field.changes_since(page.next_token).changes, [])
+
+        with assert_raises(ValueError):
+            field.changes_since('invalid')
+
+    def test_generic_m2m_field_changes_since_should_return_every_tombstone_once(self):
+        field = GenericManyToManyModel.related_objects.field
+        m2m_inst = GenericManyToManyModel.objects.create()
+        related_objects = [OneRelatedObject.objects.create() for _ in range(4)]
+        m2m_inst.related_objects.add(*related_objects)
+        token = field.changes_since().next_token
+
+        m2m_inst.related_objects.clear()
+        # Tombstones of concurrent transactions can have primary keys in a different order than their times
+        tombstones = list(GenericManyToManyTombstone.objects.filter(field=field.label).order_by('pk'))
+        GenericManyToManyTombstone.objects.filter(pk=tombstones[0].pk).update(
+            created_at=tombstones[-1].created_at + timedelta(seconds=1)
+        )
+
+        page = field.changes_since(token)
+        assert_equal(len(page.changes), 4)
+        assert_equal(field.changes_since(page.next_token).changes, [])
+
+        deleted_object_ids = []
+        for _ in range(10):
+            page = field.changes_since(token, limit=1)
+            if not page.changes:
+                break
+            deleted_object_ids += [change.object_id for change in page.changes if change.action == 'delete']
+            token = page.next_token
+        assert_equal(sorted(deleted_object_ids), sorted(str(obj.pk) for obj in related_objects))
+        assert_equal(field.changes_since(token).changes, [])
+
+        m2m_inst.related_objects.add(related_objects[0])
+        m2m_inst.related_objects.remove(related_objects[0])
+        page = field.changes_since(token, lag=timedelta(minutes=1))
+        assert_equal(page.changes, [])
+        assert_equal(
+            [(change.action, change.object_id) for change in field.changes_since(page.next_token).changes],
+            [('delete', str(related_objects[0].pk))]
+        )
+
+    def test_named_generic_m2m_field_should_return_changes_since_token(self):
+        field = NamedGenericManyToManyModel.related_objects.field
+        m2m_inst = NamedGenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+
+        m2m_inst.related_objects.add(related_object1=related_object_inst1, related_object2=related_object_inst1)
+        token = field.changes_since().next_token
+
+        m2m_inst.related_objects.add(related_object1=related_object_inst2)
+        page = field.changes_since(token)
+        assert_equal(
+            [(change.action, change.name, change.object_id) for change in page.changes],
+            [('update', 'related_object1', 'unique')]
+        )
+
+        m2m_inst.related_objects.clear()
+        assert_equal(
+            {(change.action, change.name, change.object_id) for change in field.changes_since(page.next_token).changes},
+            {('delete', 'related_object1', 'unique'), ('delete', 'related_object2', str(related_object_inst1.pk))}
+        )
+
+    def test_generic_m2m_manager_should_return_count_of_related_objects_by_model(self):
+        m2m_inst = GenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+        related_object_inst3 = OneRelatedObject.objects.create()
+
+        assert_equal(m2m_inst.related_objects.count_by_model(), {})
+        m2m_inst.related_objects.add(related_object_inst1, related_object_inst2, related_object_inst3)
+        with self.assertNumQueries(1):
+            assert_equal(m2m_inst.related_objects.count_by_model(), {OneRelatedObject: 2, SecondRelatedObject: 1})
+
+    def test_generic_m2m_field_should_return_top_targets(self):
+        field = GenericManyToManyModel.related_objects.field
+        m2m_inst1, m2m_inst2, m2m_inst3 = [GenericManyToManyModel.objects.create() for _ in range(3)]
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+        related_object_inst3 = OneRelatedObject.objects.create()
+
+        m2m_inst1.related_objects.add(related_object_inst1, related_object_inst2, related_object_inst3)
+        m2m_inst2.related_objects.add(related_object_inst2, related_object_inst3)
+        m2m_inst3.related_objects.add(related_object_inst2)
+
+        with self.assertNumQueries(3):
+            assert_equal(
+                field.top_targets(limit=2),
+                [(related_object_inst2, 3), (related_object_inst3, 2)]
+            )
+        assert_equal(
+            field.top_targets(model=OneRelatedObject),
+            [(related_object_inst3, 2), (related_object_inst1, 1)]
+        )
+
+    def test_generic_m2m_manager_should_check_whether_objects_are_related(self):
+        m2m_inst = GenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+        related_object_inst3 = OneRelatedObject.objects.create()
+
+        m2m_inst.related_objects.add(related_object_inst1, related_object_inst2)
+
+        assert_true(m2m_inst.related_objects.contains(related_object_inst1))
+        assert_false(m2m_inst.related_objects.contains(related_object_inst3))
+        with self.assertNumQueries(1):
+            assert_equal(
+                m2m_inst.related_objects.contains_many(
+                    related_object_inst1, related_object_inst2, related_object_inst3
+                ),
+                {related_object_inst1, related_object_inst2}
+            )
+
+        m2m_inst = GenericManyToManyModel.objects.prefetch_related('_related_objects').get(pk=m2m_inst.pk)
+        with self.assertNumQueries(0):
+            assert_true(m2m_inst.related_objects.contains(related_object_inst2))
+            assert_false(m2m_inst.related_objects.contains(related_object_inst3))
+            assert_equal(
+                m2m_inst.related_objects.contains_many(related_object_inst1, related_object_inst3),
+                {related_object_inst1}
+            )
+
+    def test_generic_m2m_manager_should_copy_relations_to_other_parents(self):
+        m2m_inst1, m2m_inst2, m2m_inst3 = [GenericManyToManyModel.objects.create() for _ in range(3)]
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+        related_object_inst3 = OneRelatedObject.objects.create()
+
+        m2m_inst1.related_objects.add(related_object_inst1, related_object_inst2)
+        m2m_inst2.related_objects.add(related_object_inst2, related_object_inst3)
+
+        # Savepoint, one INSERT ... SELECT statement per parent and savepoint release
+        with self.assertNumQueries(4):
+            m2m_inst1.related_objects.copy_to(m2m_inst2, m2m_inst3)
+        assert_equal(
+            set(m2m_inst2.related_objects.values_list('object_id', flat=True)),
+            {str(related_object_inst1.pk), 'unique', str(related_object_inst3.pk)}
+        )
+        assert_equal(
+            set(m2m_inst3.related_objects.values_list('object_id', flat=True)),
+            {str(related_object_inst1.pk), 'unique'}
+        )
+        assert_equal(m2m_inst1.related_objects.count(), 2)
+
+    def test_generic_m2m_field_should_clone_named_and_counted_relations(self):
+        m2m_inst1, m2m_inst2 = [CountedNamedGenericManyToManyModel.objects.create() for _ in range(2)]
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='unique')
+
+        m2m_inst1.related_objects.add(related_object1=related_object_inst1, related_object2=related_object_inst2)
+        m2m_inst2.related_objects.add(related_object1=related_object_inst2)
+
+        CountedNamedGenericManyToManyModel.related_objects.field.clone_relations(m2m_inst1, m2m_inst2)
+        assert_equal(m2m_inst2.related_objects.to_dict(), dict(
+            related_object1=related_object_inst2,
+            related_object2=related_object_inst2,
+        ))
+        m2m_inst2.refresh_from_db()
+        assert_equal(m2m_inst2.related_count, 2)
+
+    def test_retarget_should_move_relations_of_all_fields_to_new_object(self):
+        m2m_inst1, m2m_inst2, m2m_inst3 = [GenericManyToManyModel.objects.create() for _ in range(3)]
+        named_m2m_inst = NamedGenericManyToManyModel.objects.create()
+        counted_m2m_inst = CountedGenericManyToManyModel.objects.create()
+        old_related_object_inst = OneRelatedObject.objects.create()
+        new_related_object_inst = SecondRelatedObject.objects.create(id='unique')
+
+        m2m_inst1.related_objects.add(old_related_object_inst)
+        m2m_inst2.related_objects.add(old_related_object_inst, new_related_object_inst)
+        m2m_inst3.related_objects.add(new_related_object_inst)
+        named_m2m_inst.related_objects.add(related_object1=old_related_object_inst)
+        counted_m2m_inst.related_objects.add(old_related_object_inst)
+
+        field = GenericManyToManyModel.related_objects.field
+        token = field.changes_since().next_token
+        result = retarget(old_related_object_inst, new_related_object_inst, chunk_size=1)
+        assert_equal(result['app.GenericManyToManyModel.related_objects'], (1, 1))
+        # Relations with the old object are deleted and re-pointed relations are updated in the change feed
+        assert_equal(
+            {
+                (change.action, change.parent_pk, change.object_id)
+                for change in field.changes_since(token).changes
+            },
+            {
+                ('delete', m2m_inst1.pk, str(old_related_object_inst.pk)),
+                ('delete', m2m_inst2.pk, str(old_related_object_inst.pk)),
+                ('update', m2m_inst1.pk, 'unique'),
+            }
+        )
+        assert_equal(result['app.NamedGenericManyToManyModel.related_objects'], (1, 0))
+        assert_equal(result['app.CountedGenericManyToManyModel.related_objects'], (1, 0))
+
+        for m2m_inst in (m2m_inst1, m2m_inst2, m2m_inst3, counted_m2m_inst):
+            assert_equal(list(m2m_inst.related_objects.values_list('object_id', flat=True)), ['unique'])
+        assert_equal(named_m2m_inst.related_objects.related_object1, new_related_object_inst)
+        counted_m2m_inst.refresh_from_db()
+        assert_equal((counted_m2m_inst.related_count, counted_m2m_inst.related_one_count), (1, 0))
+
+        result = retarget_many([(new_related_object_inst, old_related_object_inst)])
+        assert_equal(result['app.GenericManyToManyModel.related_objects'], (3, 0))
+
+        # Retargeting to the same object changes nothing
+        result = retarget(old_related_object_inst, old_related_object_inst)
+        assert_equal(result['app.GenericManyToManyModel.related_objects'], (0, 0))
+        assert_equal(m2m_inst1.related_objects.count(), 1)
+
+    def _login_admin(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def test_generic_m2m_admin_inline_should_resolve_related_objects_in_batch(self):
+        self._login_admin()
+        m2m_inst = NamedGenericManyToManyModel.objects.create()
+        m2m_inst.related_objects.add(
+            a=OneRelatedObject.objects.create(), b=SecondRelatedObject.objects.create(id='test 1')
+        )
+        change_url = reverse('admin:app_namedgenericmanytomanymodel_change', args=(m2m_inst.pk,))
+        self.client.get(change_url)
+
+        with CaptureQueriesContext(connection) as queries:
+            assert_equal(self.client.get(change_url).status_code, 200)
+        m2m_inst.related_objects.add(**{
+            'c{}'.format(i): obj for i, obj in enumerate(
+                [OneRelatedObject.objects.create() for _ in range(3)]
+                + [SecondRelatedObject.objects.create(id='test {}'.format(i + 2)) for i in range(3)]
+            )
+        })
+        with CaptureQueriesContext(connection) as more_relations_queries:
+            response = self.client.get(change_url)
+        assert_equal(len(queries), len(more_relations_queries))
+        assert_true(str(SecondRelatedObject.objects.get(id='test 4')) in response.content.decode())
+
+    def test_generic_m2m_admin_inline_should_paginate_relations(self):
+        self._login_admin()
+        m2m_inst = GenericManyToManyModel.objects.create()
+        m2m_inst.related_objects.add(*[OneRelatedObject.objects.create() for _ in range(3)])
+        change_url = reverse('admin:app_genericmanytomanymodel_change', args=(m2m_inst.pk,))
+
+        response = self.client.get(change_url)
+        assert_equal(response.context['inline_admin_formsets'][0].formset.initial_form_count(), 2)
+        response = self.client.get(change_url, {'related_objects_page': 2})
+        assert_equal(response.context['inline_admin_formsets'][0].formset.initial_form_count(), 1)
+
+    def test_generic_m2m_admin_autocomplete_should_search_models_with_limit(self):
+        self._login_admin()
+        m2m_inst = GenericManyToManyModel.objects.create()
+        for i in range(3):
+            OneRelatedObject.objects.create(id=i + 10)
+            SecondRelatedObject.objects.create(id='a{}'.format(i))
+        SecondRelatedObject.objects.create(id='b1')
+        autocomplete_url = reverse(
+            'admin:app_genericmanytomanymodel_generic_m2m_autocomplete', args=('related_objects',)
+        )
+
+        results = self.client.get(autocomplete_url, {'term': '1'}).json()['results']
+        assert_equal(len(results), 4)
+        assert_equal(
+            {result['id'] for result in results if result['model'] == 'second related object'},
+            {'{}:{}'.format(ContentType.objects.get_for_model(SecondRelatedObject).pk, pk) for pk in ('a1', 'b1')}
+        )
+        assert_equal(self.client.get(autocomplete_url, {'term': ''}).json()['results'], [])
+        assert_equal(self.client.get(reverse(
+            'admin:app_genericmanytomanymodel_generic_m2m_autocomplete', args=('invalid',)
+        ), {'term': '1'}).status_code, 404)
+        assert_equal(m2m_inst.related_objects.count(), 0)
+
+    def test_generic_m2m_admin_inline_should_change_relations_with_manager(self):
+        self._login_admin()
+        m2m_inst = CountedGenericManyToManyModel.objects.create()
+        related_object = OneRelatedObject.objects.create()
+        change_url = reverse('admin:app_countedgenericmanytomanymodel_change', args=(m2m_inst.pk,))
+        object_value = '{}:{}'.format(ContentType.objects.get_for_model(OneRelatedObject).pk, related_object.pk)
+
+        response = self.client.post(change_url, {
+            '_related_objects-TOTAL_FORMS': '1',
+            '_related_objects-INITIAL_FORMS': '0',
+            '_related_objects-0-object': object_value,
+        })
+        assert_equal(response.status_code, 302)
+        m2m_inst.refresh_from_db()
+        assert_equal(m2m_inst.related_count, 1)
+        assert_equal(m2m_inst.related_one_count, 1)
+        assert_true(m2m_inst.related_objects.contains(related_object))
+
+        response = self.client.post(change_url, {
+            '_related_objects-TOTAL_FORMS': '2',
+            '_related_objects-INITIAL_FORMS': '0',
+            '_related_objects-0-object': object_value,
+            '_related_objects-1-object': '{}:invalid'.format(
+                ContentType.objects.get_for_model(OneRelatedObject).pk
+            ),
+        })
+        assert_equal(response.status_code, 200)
+
+        # Only objects of the autocomplete models can be related
+        response = self.client.post(change_url, {
+            '_related_objects-TOTAL_FORMS': '1',
+            '_related_objects-INITIAL_FORMS': '0',
+            '_related_objects-0-object': '{}:{}'.format(
+                ContentType.objects.get_for_model(SecondRelatedObject).pk,
+                SecondRelatedObject.objects.create(id='test').pk
+            ),
+        })
+        assert_equal(response.status_code, 200)
+        assert_equal(m2m_inst.related_objects.count(), 1)
+
+        response = self.client.post(change_url, {
+            '_related_objects-TOTAL_FORMS': '1',
+            '_related_objects-INITIAL_FORMS': '1',
+            '_related_objects-0-id': m2m_inst.related_objects.get().pk,
+            '_related_objects-0-DELETE': 'on',
+        })
+        assert_equal(response.status_code, 302)
+        m2m_inst.refresh_from_db()
+        assert_equal(m2m_inst.related_count, 0)
+        assert_equal(m2m_inst.related_one_count, 0)
+
+    def test_generic_m2m_manager_should_send_signals_once_per_call(self):
+        sent_signals = []
+
+        def receiver(signal, sender, instance, field, object_keys, using, **kwargs):
+            sent_signals.append((signal, instance, field, object_keys))
+
+        receivers = (pre_add, post_add, pre_remove, post_remove, pre_clear, post_clear)
+        for signal in receivers:
+            signal.connect(receiver, sender=GenericManyToManyModel.related_objects.through)
+            signal.connect(receiver, sender=NamedGenericManyToManyModel.related_objects.through)
+        try:
+            m2m_inst = GenericManyToManyModel.objects.create()
+            field = GenericManyToManyModel.related_objects.field
+            related_object_inst1 = OneRelatedObject.objects.create()
+            related_object_inst2 = SecondRelatedObject.objects.create(id='test')
+            one_ct_id = ContentType.objects.get_for_model(OneRelatedObject).pk
+            second_ct_id = ContentType.objects.get_for_model(SecondRelatedObject).pk
+            object_key1 = (one_ct_id, str(related_object_inst1.pk))
+            object_key2 = (second_ct_id, 'test')
+
+            m2m_inst.related_objects.add(related_object_inst1, related_object_inst2)
+            assert_equal(sent_signals, [
+                (pre_add, m2m_inst, field, frozenset((object_key1, object_key2))),
+                (post_add, m2m_inst, field, frozenset((object_key1, object_key2))),
+            ])
+            sent_signals.clear()
+            # Objects which are already related are not added again
+            m2m_inst.related_objects.add(related_object_inst1)
+            m2m_inst.related_objects.set(related_object_inst1)
+            assert_equal(sent_signals, [
+                (pre_remove, m2m_inst, field, frozenset((object_key2,))),
+                (post_remove, m2m_inst, field, frozenset((object_key2,))),
+            ])
+            sent_signals.clear()
+            m2m_inst.related_objects.remove(related_object_inst1)
+            m2m_inst.related_objects.clear()
+            assert_equal(sent_signals, [
+                (pre_remove, m2m_inst, field, frozenset((object_key1,))),
+                (post_remove, m2m_inst, field, frozenset((object_key1,))),
+                (pre_clear, m2m_inst, field, None),
+                (post_clear, m2m_inst, field, None),
+            ])
+
+            sent_signals.clear()
+            named_m2m_inst = NamedGenericManyToManyModel.objects.create()
+            named_field = NamedGenericManyToManyModel.related_objects.field
+            with generic_m2m_batch():
+                named_m2m_inst.related_objects.add(a=related_object_inst1)
+                named_m2m_inst.related_objects.add(b=related_object_inst2)
+                assert_equal(sent_signals, [])
+            named_m2m_inst.related_objects.add(a=related_object_inst1, b=related_object_inst1)
+            named_m2m_inst.related_objects.remove('b')
+            assert_equal(sent_signals, [
+                (pre_add, named_m2m_inst, named_field, frozenset(('a', 'b'))),
+                (post_add, named_m2m_inst, named_field, frozenset(('a', 'b'))),
+                (pre_add, named_m2m_inst, named_field, frozenset(('b',))),
+                (post_add, named_m2m_inst, named_field, frozenset(('b',))),
+                (pre_remove, named_m2m_inst, named_field, frozenset(('b',))),
+                (post_remove, named_m2m_inst, named_field, frozenset(('b',))),
+            ])
+        finally:
+            for signal in receivers:
+                signal.disconnect(receiver, sender=GenericManyToManyModel.related_objects.through)
+                signal.disconnect(receiver, sender=NamedGenericManyToManyModel.related_objects.through)
+
+    def test_copy_and_retarget_should_send_signals_once_per_parent(self):
+        sent_signals = []
+
+        def receiver(signal, sender, instance, field, object_keys, using, **kwargs):
+            sent_signals.append((signal, instance, object_keys))
+
+        receivers = (pre_add, post_add, pre_remove, post_remove)
+        for signal in receivers:
+            signal.connect(receiver, sender=GenericManyToManyModel.related_objects.through)
+            signal.connect(receiver, sender=NamedGenericManyToManyModel.related_objects.through)
+        try:
+            m2m_inst1, m2m_inst2, m2m_inst3 = (GenericManyToManyModel.objects.create() for _ in range(3))
+            named_m2m_inst = NamedGenericManyToManyModel.objects.create()
+            old_related_object_inst = OneRelatedObject.objects.create()
+            new_related_object_inst = SecondRelatedObject.objects.create(id='test')
+            old_object_key = (ContentType.objects.get_for_model(OneRelatedObject).pk, str(old_related_object_inst.pk))
+            new_object_key = (ContentType.objects.get_for_model(SecondRelatedObject).pk, 'test')
+            m2m_inst1.related_objects.add(old_related_object_inst)
+            m2m_inst3.related_objects.add(old_related_object_inst, new_related_object_inst)
+            named_m2m_inst.related_objects.add(a=old_related_object_inst, b=old_related_object_inst)
+
+            # Relations which the parent already has are not copied
+            sent_signals.clear()
+            m2m_inst1.related_objects.copy_to(m2m_inst2, m2m_inst3)
+            assert_equal(sent_signals, [
+                (pre_add, m2m_inst2, frozenset((old_object_key,))),
+                (post_add, m2m_inst2, frozenset((old_object_key,))),
+            ])
+
+            sent_signals.clear()
+            retarget(old_related_object_inst, new_related_object_inst)
+            assert_equal(
+                {signal_args for signal_args in sent_signals if signal_args[0] in {pre_remove, post_remove}},
+                {
+                    (signal, m2m_inst, frozenset((old_object_key,)))
+                    for signal in (pre_remove, post_remove) for m2m_inst in (m2m_inst1, m2m_inst2, m2m_inst3)
+                }
+            )
+            assert_equal(
+                {signal_args for signal_args in sent_signals if signal_args[0] in {pre_add, post_add}},
+                {
+                    (signal, m2m_inst, frozenset((new_object_key,)))
+                    for signal in (pre_add, post_add) for m2m_inst in (m2m_inst1, m2m_inst2)
+                } | {
+                    (signal, named_m2m_inst, frozenset(('a', 'b'))) for signal in (pre_add, post_add)
+                }
+            )
+            # The third parent already had the new object, its relation with the old object is only removed
+            assert_equal(len(sent_signals), 12)
+        finally:
+            for signal in receivers:
+                signal.disconnect(receiver, sender=GenericManyToManyModel.related_objects.through)
+                signal.disconnect(receiver, sender=NamedGenericManyToManyModel.related_objects.through)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class GenericManyToManyConcurrencyTestCase(GermaniumTestCaseMixin, TransactionTestCase):
+
+    workers = 8
+    iterations = 50
+    timeout = 60
+    # Throughput depends on the machine, it is checked only if the minimum is configured
+    min_operations_per_second = getattr(settings, 'CONCURRENCY_TEST_MIN_OPERATIONS_PER_SECOND', None)
+
+    def _run_concurrently(self, worker, operations_per_worker):
+        errors = []
+
+        def run(worker_index):
+            try:
+                worker(worker_index)
+            except Exception as ex:  # pylint: disable=W0703
+                errors.append(ex)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(self.workers)]
+        started_at = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(self.timeout)
+        operations_per_second = self.workers * operations_per_worker / (time.monotonic() - started_at)
+        assert_false(any(thread.is_alive() for thread in threads))
+        assert_equal(errors, [])
+        if self.min_operations_per_second is not None:
+            assert_true(
+                operations_per_second >= self.min_operations_per_second,
+                'Throughput {:.1f} operations per second is lower than {}'.format(
+                    operations_per_second, self.min_operations_per_second
+                )
+            )
+        return operations_per_second
+
+    def test_concurrent_add_set_and_remove_should_not_fail_and_keep_relations_unique(self):
+        parents = [GenericManyToManyModel.objects.create() for _ in range(3)]
+        related_objects = [OneRelatedObject.objects.create() for _ in range(10)]
+
+        def worker(worker_index):
+            rand = random.Random(worker_index)
+            for _ in range(self.iterations):
+                parent = rand.choice(parents)
+                objs = rand.sample(related_objects, 3)
+                operation = rand.choice(('add', 'add', 'remove', 'set'))
+                getattr(parent.related_objects, operation)(*objs)
+
+        self._run_concurrently(worker, self.iterations)
+
+        for parent in parents:
+            object_ids = list(parent.related_objects.values_list('object_id', flat=True))
+            assert_equal(len(object_ids), len(set(object_ids)))
+
+        self._run_concurrently(lambda worker_index: [
+            parent.related_objects.add(*related_objects) for parent in parents
+        ], len(parents))
+        for parent in parents:
+            assert_equal(parent.related_objects.count(), len(related_objects))
+
+    def test_concurrent_named_add_should_not_fail_and_keep_one_relation_per_name(self):
+        parent = NamedGenericManyToManyModel.objects.create()
+        related_objects = [OneRelatedObject.objects.create() for _ in range(self.workers)]
+
+        self._run_concurrently(lambda worker_index: [
+            parent.related_objects.add(first=related_objects[worker_index], second=related_objects[worker_index])
+            for _ in range(self.iterations)
+        ], self.iterations)
+        assert_equal(set(parent.related_objects.values_list('name', flat=True)), {'first', 'second'})
+
+    def test_concurrent_ordered_add_should_append_with_unique_positions(self):
+        parent = OrderedGenericManyToManyModel.objects.create()
+        related_objects = [OneRelatedObject.objects.create() for _ in range(self.workers * 5)]
+
+        self._run_concurrently(lambda worker_index: [
+            parent.related_objects.add(related_object)
+            for related_object in related_objects[worker_index * 5:(worker_index + 1) * 5]
+        ], 5)
+        positions = list(parent.related_objects.values_list('position', flat=True))
+        assert_equal(len(positions), len(related_objects))
+        assert_equal(len(set(positions)), len(related_objects))
+
+
+class MultipleDBGenericManyToManyTestCase(GermaniumTestCase):
+
+    databases = {'default', 'relations'}
+
+    def test_dedicated_db_generic_m2m_should_store_relations_in_dedicated_database(self):
+        m2m_inst = DedicatedDBGenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.using('relations').create(id='test')
+        through = DedicatedDBGenericManyToManyModel.related_objects.through
+
+        m2m_inst.related_objects.add(related_object_inst1, related_object_inst2)
+        assert_equal(through.objects.using('relations').count(), 2)
+        assert_equal(through.objects.using('default').count(), 0)
+        assert_equal(m2m_inst.related_objects.count(), 2)
+        assert_equal(list(m2m_inst.related_objects.get_object_pks(SecondRelatedObject)), ['test'])
+
+        m2m_inst.related_objects.set(related_object_inst1)
+        assert_equal(list(m2m_inst.related_objects.values_list('object_id', flat=True)), [str(related_object_inst1.pk)])
+        m2m_inst.related_objects.remove(related_object_inst1)
+        assert_equal(m2m_inst.related_objects.count(), 0)
+        m2m_inst.related_objects.add(related_object_inst2)
+        m2m_inst.related_objects.clear()
+        assert_equal(through.objects.using('relations').count(), 0)
+
+    def test_dedicated_db_generic_m2m_should_delete_relations_and_read_tombstones_in_dedicated_database(self):
+        m2m_inst1 = DedicatedDBGenericManyToManyModel.objects.create()
+        m2m_inst2 = DedicatedDBGenericManyToManyModel.objects.create()
+        related_object_inst = OneRelatedObject.objects.create()
+        field = DedicatedDBGenericManyToManyModel.related_objects.field
+        through = field.through
+
+        m2m_inst1.related_objects.add(related_object_inst)
+        m2m_inst2.related_objects.add(related_object_inst)
+        token = field.changes_since().next_token
+        m2m_inst1_pk = m2m_inst1.pk
+        m2m_inst1.delete()
+        assert_equal(
+            list(through.objects.using('relations').values_list(field.parent_field.attname, flat=True)), [m2m_inst2.pk]
+        )
+        assert_equal(GenericManyToManyTombstone.objects.using('default').count(), 0)
+        assert_equal(
+            [(change.action, change.parent_pk) for change in field.changes_since(token).changes],
+            [('delete', m2m_inst1_pk)]
+        )
+
+        DedicatedDBGenericManyToManyModel.objects.all().delete()
+        assert_equal(through.objects.using('relations').count(), 0)
+
+    def test_dedicated_db_generic_m2m_should_be_prefetched_from_dedicated_database(self):
+        m2m_inst = DedicatedDBGenericManyToManyModel.objects.create()
+        related_object_inst = OneRelatedObject.objects.create()
+        m2m_inst.related_objects.add(related_object_inst)
+
+        m2m_inst = DedicatedDBGenericManyToManyModel.objects.prefetch_related('_related_objects').get(pk=m2m_inst.pk)
+        with self.assertNumQueries(0, using='relations'):
+            assert_equal(len(m2m_inst.related_objects.all()), 1)
+        assert_true(m2m_inst.related_objects.contains(related_object_inst))
+
+    def test_dedicated_db_generic_m2m_should_not_be_joined_with_parents(self):
+        with assert_raises(FieldError):
+            list(DedicatedDBGenericManyToManyModel.objects.filter(related_objects__object_id='1'))
+
+    def test_multiple_db_generic_m2m_should_validate_content_type_ids_once_per_database(self):
+        m2m_inst = MultipleDBGenericManyToManyModel.objects.create()
+        related_objects = [OneRelatedObject.objects.using('relations').create() for _ in range(3)] + [
+            SecondRelatedObject.objects.using('relations').create(id='test')
+        ]
+
+        with self.assertNumQueries(1, using='relations'):
+            m2m_inst.related_objects.add(*related_objects)
+        assert_equal(m2m_inst.related_objects.count(), 4)
+
+        ContentType.objects.using('relations').filter(
+            pk=ContentType.objects.get_for_model(OneRelatedObject).pk
+        ).update(model='other')
+        with assert_raises(ValueError):
+            m2m_inst.related_objects.add(OneRelatedObject.objects.using('relations').create())
+        # Related objects from the database of content types are not validated
+        m2m_inst.related_objects.add(SecondRelatedObject.objects.create(id='default'))
+        assert_equal(m2m_inst.related_objects.count(), 5)
+
+    def test_dedicated_db_generic_m2m_batch_should_write_changes_on_commit_of_through_model_database(self):
+        m2m_inst = DedicatedDBGenericManyToManyModel.objects.create()
+        related_object_inst1 = OneRelatedObject.objects.create()
+        related_object_inst2 = SecondRelatedObject.objects.create(id='test')
+
+        with self.captureOnCommitCallbacks(using='relations', execute=True) as callbacks:
+            with transaction.atomic(using='relations'):
+                with generic_m2m_batch(on_commit=True):
+                    m2m_inst.related_objects.add(related_object_inst1, related_object_inst2)
+                assert_equal(m2m_inst.related_objects.count(), 0)
+        assert_equal(len(callbacks), 1)
+        assert_equal(m2m_inst.related_objects.count(), 2)
+
+        with generic_m2m_batch():
+            m2m_inst.related_objects.remove(related_object_inst1)
+            GenericManyToManyModel.objects.create().related_objects.add(related_object_inst1)
+        assert_equal(m2m_inst.related_objects.count(), 1)
+        assert_equal(GenericManyToManyModel.related_objects.through.objects.count(), 1)
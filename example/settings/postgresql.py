@@ -0,0 +1,17 @@
+from settings.settings import *  # pylint: disable=E0401
+
+
+# SQLite test databases don't allow concurrent connections, concurrency tests run with a server database only
+DATABASES['default'] = {
+    'ENGINE': 'django.db.backends.postgresql',
+    'NAME': os.environ.get('DATABASE_NAME', 'generic_m2m_field'),
+    'USER': os.environ.get('DATABASE_USER', ''),
+    'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+    'HOST': os.environ.get('DATABASE_HOST', ''),
+    'PORT': os.environ.get('DATABASE_PORT', ''),
+}
+
+CONCURRENCY_TEST_MIN_OPERATIONS_PER_SECOND = (
+    float(os.environ['CONCURRENCY_TEST_MIN_OPERATIONS_PER_SECOND'])
+    if 'CONCURRENCY_TEST_MIN_OPERATIONS_PER_SECOND' in os.environ else None
+)
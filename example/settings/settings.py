@@ -5,6 +5,9 @@ DEBUG = TEMPLATE_DEBUG = THUMBNAIL_DEBUG = True
 
 ALLOWED_HOSTS = ['localhost']
 
+# SQLite databases are stored in the ignored var directory which is not a part of the repository
+os.makedirs(os.path.join(PROJECT_DIR, 'var', 'db'), exist_ok=True)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -12,6 +15,12 @@ DATABASES = {
         'USER': '',
         'PASSWORD': '',
     },
+    'relations': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(PROJECT_DIR, 'var', 'db', 'relations.db'),
+        'USER': '',
+        'PASSWORD': '',
+    },
 }
 
 ROOT_URLCONF = 'urls'
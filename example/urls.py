@@ -1,2 +1,7 @@
+from django.contrib import admin
+from django.urls import path
+
+
 urlpatterns = [
+    path('admin/', admin.site.urls),
 ]
@@ -0,0 +1,235 @@
+from functools import reduce
+from operator import or_
+
+from django import forms
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.auth import get_permission_codename
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.forms.models import BaseInlineFormSet
+from django.http import Http404, JsonResponse
+from django.urls import NoReverseMatch, path, reverse
+from django.utils.functional import cached_property
+from django.utils.translation import ugettext_lazy as _
+
+from generic_m2m_field.models import get_generic_m2m_field
+from generic_m2m_field.utils import get_objects_q
+
+
+class GenericObjectAutocompleteWidget(forms.TextInput):
+
+    class Media:
+        js = ('generic_m2m_field/js/autocomplete.js',)
+
+
+class GenericManyToManyInlineForm(forms.ModelForm):
+
+    autocomplete_url = None
+    allowed_object_ct_ids = frozenset()
+
+    object = forms.CharField(
+        label=_('new related object'),
+        widget=GenericObjectAutocompleteWidget
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.autocomplete_url:
+            self.fields['object'].widget.attrs['data-autocomplete-url'] = self.autocomplete_url
+        if self.instance.pk:
+            # Existing relations can be only removed, new target is selected with a new relation
+            self.initial['object'] = '{}:{}'.format(self.instance.object_ct_id, self.instance.object_id)
+            self.fields['object'].widget = forms.HiddenInput()
+            for field in self.fields.values():
+                field.disabled = True
+
+    def clean_object(self):
+        if self.instance.pk:
+            return self.instance.object_ct_id, self.instance.object_id
+
+        try:
+            object_ct_id, object_id = self.cleaned_data['object'].split(':', 1)
+            # Only objects of models which can be searched by the autocomplete can be related
+            if int(object_ct_id) not in self.allowed_object_ct_ids:
+                raise ValueError
+            model_class = ContentType.objects.get_for_id(int(object_ct_id)).model_class()
+            object_pk = model_class._meta.pk.to_python(object_id)
+            if not model_class._default_manager.filter(pk=object_pk).exists():
+                raise ValueError
+        except (AttributeError, ValueError, ValidationError, ContentType.DoesNotExist):
+            raise ValidationError(_('Select a valid related object.'))
+        return int(object_ct_id), str(object_pk)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if 'object' in cleaned_data:
+            self.instance.object_ct_id, self.instance.object_id = cleaned_data['object']
+        return cleaned_data
+
+    def validate_unique(self):
+        # Content type and object ID are not form fields, but they are part of the unique constraint
+        exclude = set(self._get_validation_exclusions()) - {'object_ct', 'object_ct_id', 'object_id'}
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except ValidationError as ex:
+            self._update_errors(ex)
+
+
+class GenericManyToManyInlineFormSet(BaseInlineFormSet):
+
+    per_page = None
+    page_param = None
+    page_number = None
+    resolve_fields = None
+
+    @cached_property
+    def generic_m2m_field(self):
+        return get_generic_m2m_field(self.model)
+
+    def get_manager(self):
+        return getattr(self.instance, self.generic_m2m_field.name)
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            qs = super().get_queryset()
+            self.page = None
+            if self.per_page:
+                self.page = Paginator(qs.values_list('pk', flat=True), self.per_page).get_page(self.page_number)
+                qs = qs.filter(pk__in=list(self.page.object_list))
+            # Related objects are loaded with one query per content type and cached on the relations
+            qs.resolve_objects(self.resolve_fields)
+            self._queryset = qs
+        return self._queryset
+
+    def clean(self):
+        super().clean()
+        object_keys = set()
+        for form in self.forms:
+            if not form.has_changed() or self._should_delete_form(form) or 'object' not in form.cleaned_data:
+                continue
+            if form.cleaned_data['object'] in object_keys:
+                raise ValidationError(_('Related object cannot be selected more than once.'))
+            object_keys.add(form.cleaned_data['object'])
+
+    def save_new(self, form, commit=True):
+        if not commit:
+            return super().save_new(form, commit=False)
+
+        manager = self.get_manager()
+        object_key = form.cleaned_data['object']
+        if self.generic_m2m_field.is_named:
+            manager.add(**{form.cleaned_data['name']: object_key})
+            return manager.get(name=form.cleaned_data['name'])
+        else:
+            manager.add(object_key)
+            return manager.get(get_objects_q([object_key]))
+
+    def delete_existing(self, obj, commit=True):
+        if commit:
+            if self.generic_m2m_field.is_named:
+                self.get_manager().remove(obj.name)
+            else:
+                self.get_manager().remove((obj.object_ct_id, obj.object_id))
+
+
+class GenericManyToManyInline(admin.TabularInline):
+
+    form = GenericManyToManyInlineForm
+    formset = GenericManyToManyInlineFormSet
+    template = 'generic_m2m_field/admin/edit_inline/tabular.html'
+    exclude = ('object_ct', 'object_ct_id', 'object_id', 'position')
+    readonly_fields = ('related_object',)
+    extra = 1
+    per_page = 50
+    resolve_fields = None
+    autocomplete_models = {}
+    autocomplete_limit = 10
+
+    @cached_property
+    def generic_m2m_field(self):
+        return get_generic_m2m_field(self.model)
+
+    def get_page_param(self):
+        return '{}_page'.format(self.generic_m2m_field.name)
+
+    def get_autocomplete_url(self):
+        try:
+            return reverse(
+                '{}:{}_{}_generic_m2m_autocomplete'.format(
+                    self.admin_site.name, self.parent_model._meta.app_label, self.parent_model._meta.model_name
+                ),
+                args=(self.generic_m2m_field.name,)
+            )
+        except NoReverseMatch:
+            return None
+
+    def get_formset(self, request, obj=None, **kwargs):
+        kwargs.setdefault('form', type(self.form.__name__, (self.form,), {
+            'autocomplete_url': self.get_autocomplete_url(),
+            'allowed_object_ct_ids': frozenset(
+                ContentType.objects.get_for_model(model_class).pk
+                for model_class, _ in self.get_autocomplete_models(request)
+            ),
+        }))
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        formset.page_param = self.get_page_param()
+        formset.page_number = request.GET.get(formset.page_param)
+        formset.resolve_fields = self.resolve_fields
+        return formset
+
+    def related_object(self, obj):
+        return obj.object if obj.pk else '-'
+    related_object.short_description = _('related object')
+
+    def get_autocomplete_models(self, request):
+        for model_label, search_fields in self.autocomplete_models.items():
+            model_class = apps.get_model(model_label)
+            opts = model_class._meta
+            if request.user.has_perm('{}.{}'.format(opts.app_label, get_permission_codename('view', opts))):
+                yield model_class, search_fields
+
+    def get_autocomplete_querysets(self, request, term):
+        for model_class, search_fields in self.get_autocomplete_models(request):
+            yield model_class, model_class._default_manager.filter(reduce(or_, (
+                Q(**{'{}__icontains'.format(search_field): term}) for search_field in search_fields
+            )))
+
+    def get_autocomplete_results(self, request, term):
+        results = []
+        for model_class, qs in self.get_autocomplete_querysets(request, term):
+            object_ct_id = ContentType.objects.get_for_model(model_class).pk
+            results += [
+                {
+                    'id': '{}:{}'.format(object_ct_id, obj.pk),
+                    'text': str(obj),
+                    'model': str(model_class._meta.verbose_name),
+                }
+                for obj in qs[:self.autocomplete_limit]
+            ]
+        return results
+
+
+class GenericManyToManyAdminMixin:
+
+    def get_urls(self):
+        return [
+            path(
+                'generic-m2m-autocomplete/<str:field_name>/',
+                self.admin_site.admin_view(self.generic_m2m_autocomplete_view),
+                name='{}_{}_generic_m2m_autocomplete'.format(self.model._meta.app_label, self.model._meta.model_name)
+            ),
+        ] + super().get_urls()
+
+    def generic_m2m_autocomplete_view(self, request, field_name):
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+
+        for inline in self.get_inline_instances(request):
+            if isinstance(inline, GenericManyToManyInline) and inline.generic_m2m_field.name == field_name:
+                term = request.GET.get('term', '').strip()
+                return JsonResponse({'results': inline.get_autocomplete_results(request, term) if term else []})
+        raise Http404
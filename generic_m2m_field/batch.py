@@ -0,0 +1,123 @@
+import threading
+
+from contextlib import ExitStack, contextmanager
+from functools import partial
+
+from django.db import transaction
+
+from generic_m2m_field.utils import get_write_db
+
+
+_local = threading.local()
+
+
+def get_current_batch():
+    return getattr(_local, 'batch', None)
+
+
+class PendingRelationChanges:
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.db = get_write_db(manager)
+        self.cleared = False
+        self.added = {}
+        self.removed = set()
+
+    def add(self, key, value=None):
+        self.removed.discard(key)
+        self.added[key] = value
+
+    def remove(self, key):
+        self.added.pop(key, None)
+        if not self.cleared:
+            self.removed.add(key)
+
+    def clear(self):
+        self.cleared = True
+        self.added.clear()
+        self.removed.clear()
+
+    def flush(self):
+        if self.cleared:
+            self.manager.set(*self.added)
+        else:
+            if self.removed:
+                self.manager.remove(*self.removed)
+            if self.added:
+                self.manager.add(*self.added)
+
+
+class PendingNamedRelationChanges(PendingRelationChanges):
+
+    def flush(self):
+        if self.cleared:
+            self.manager.set(**self.added)
+        else:
+            if self.removed:
+                self.manager.remove(*self.removed)
+            if self.added:
+                self.manager.add(**self.added)
+
+
+class RelationBatch:
+
+    def __init__(self):
+        self.changes = {}
+
+    def _get_key(self, manager):
+        return manager.model, manager.field.name, manager.instance.pk
+
+    def get_changes(self, manager, changes_class=PendingRelationChanges):
+        key = self._get_key(manager)
+        if key not in self.changes:
+            self.changes[key] = changes_class(manager)
+        return self.changes[key]
+
+    def flush_changes(self, manager):
+        pending_changes = self.changes.pop(self._get_key(manager), None)
+        if pending_changes is not None:
+            # Manager methods write changes directly only when no batch is active
+            _local.batch = None
+            try:
+                with transaction.atomic(using=pending_changes.db):
+                    pending_changes.flush()
+            finally:
+                _local.batch = self
+
+    def get_dbs(self):
+        return {pending_changes.db for pending_changes in self.changes.values()}
+
+    def flush(self, using=None):
+        changes = {
+            key: pending_changes for key, pending_changes in self.changes.items()
+            if using is None or pending_changes.db == using
+        }
+        for key in changes:
+            del self.changes[key]
+
+        # Changes are written in one transaction per database of through models
+        with ExitStack() as stack:
+            for db in sorted({pending_changes.db for pending_changes in changes.values()}):
+                stack.enter_context(transaction.atomic(using=db))
+            for pending_changes in changes.values():
+                pending_changes.flush()
+
+
+@contextmanager
+def generic_m2m_batch(on_commit=False):
+    if get_current_batch() is not None:
+        yield get_current_batch()
+        return
+
+    batch = _local.batch = RelationBatch()
+    try:
+        yield batch
+    finally:
+        _local.batch = None
+
+    if on_commit:
+        for db in batch.get_dbs():
+            transaction.on_commit(partial(batch.flush, using=db), using=db)
+    else:
+        batch.flush()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from generic_m2m_field.models import get_generic_m2m_fields
+
+
+class Command(BaseCommand):
+
+    help = 'Recompute denormalized related object counters of generic many to many fields'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_labels', nargs='*', help='Recompute counters only of the given models')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of parent objects in one update')
+
+    def handle(self, *args, **options):
+        model_labels = {model_label.lower() for model_label in options['model_labels']}
+        for field in get_generic_m2m_fields():
+            if field.has_counters and (not model_labels or field.model._meta.label_lower in model_labels):
+                recomputed = field.recompute_counters(chunk_size=options['chunk_size'])
+                self.stdout.write(
+                    '{}.{}: {} objects recomputed'.format(field.model._meta.label, field.name, recomputed)
+                )
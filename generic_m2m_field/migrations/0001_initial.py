@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenericManyToManyTombstone',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='created at')),
+                ('changed_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='changed at')),
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('field', models.CharField(max_length=255, verbose_name='generic many to many field')),
+                ('parent_id', models.TextField(verbose_name='ID of the parent object')),
+                ('object_ct_id', models.PositiveIntegerField(verbose_name='content type of the related object')),
+                ('object_id', models.TextField(verbose_name='ID of the related object')),
+                ('name', models.CharField(blank=True, max_length=200, null=True, verbose_name='name')),
+            ],
+            options={
+                'verbose_name': 'removed generic many to many relation',
+                'verbose_name_plural': 'removed generic many to many relations',
+                'index_together': {('field', 'id')},
+            },
+        ),
+    ]
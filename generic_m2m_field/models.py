@@ -1,88 +1,577 @@
 import re
 
+from collections import Counter, namedtuple
+from contextlib import ExitStack, contextmanager, nullcontext
+from functools import reduce
+from itertools import takewhile
+from operator import or_
 from types import MethodType
 
+from django.apps import apps
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
-from django.db.models.functions import Cast
+from django.db import connections, models, router, transaction
+from django.db.models import Case, Count, F, Max, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils.dateparse import parse_datetime
 from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 
 from chamber.models import SmartModel, SmartQuerySet
 from chamber.shortcuts import get_object_or_none
 
+from generic_m2m_field.batch import PendingNamedRelationChanges, get_current_batch
+from generic_m2m_field.signals import post_add, post_clear, post_remove, pre_add, pre_clear, pre_remove
+from generic_m2m_field.utils import get_objects_q, get_write_db
+
 
 def camel_to_snake(name):
   name = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
   return re.sub('([a-z0-9])([A-Z])', r'\1_\2', name).lower()
 
 
+class RelatedObjectRef(namedtuple('RelatedObjectRef', ('model_label', 'pk'))):
+
+    __slots__ = ()
+
+    @property
+    def model_class(self):
+        return apps.get_model(self.model_label)
+
+
+RelatedObjectPage = namedtuple('RelatedObjectPage', ('items', 'next_cursor'))
+
+RelationChange = namedtuple(
+    'RelationChange', ('action', 'parent_pk', 'object_ct_id', 'object_id', 'name', 'changed_at')
+)
+
+RelationChangesPage = namedtuple('RelationChangesPage', ('changes', 'next_token'))
+
+RetargetResult = namedtuple('RetargetResult', ('updated', 'deleted'))
+
+
 def _get_object_ct_and_pk(obj):
-    if isinstance(obj, (list, tuple)) and len(obj) == 2:
+    if isinstance(obj, RelatedObjectRef):
+        return ContentType.objects.get_for_model(obj.model_class).pk, obj.pk
+    elif isinstance(obj, (list, tuple)) and len(obj) == 2:
         return obj
     else:
         return ContentType.objects.get_for_model(obj).pk, obj.pk
 
 
+def _get_object_key(obj):
+    object_ct_id, object_id = _get_object_ct_and_pk(obj)
+    return object_ct_id, str(object_id)
+
+
+def _build_relation(manager, obj, **kwargs):
+    object_ct_id, object_id = _get_object_key(obj)
+    return manager.model(
+        object_ct_id=object_ct_id,
+        object_id=object_id,
+        **{manager.field.name: manager.instance},
+        **kwargs
+    )
+
+
+def _has_signal_listeners(field, *signals):
+    return any(signal.has_listeners(field.through) for signal in signals)
+
+
+@contextmanager
+def _send_signals(field, instance, using, pre_signal, post_signal, get_object_keys=None):
+    if not _has_signal_listeners(field, pre_signal, post_signal):
+        yield
+        return
+
+    object_keys = frozenset(get_object_keys()) if get_object_keys else None
+    if object_keys is not None and not object_keys:
+        yield
+        return
+
+    signal_kwargs = {
+        'sender': field.through,
+        'instance': instance,
+        'field': field,
+        'object_keys': object_keys,
+        'using': using,
+    }
+    pre_signal.send(**signal_kwargs)
+    yield
+    post_signal.send(**signal_kwargs)
+
+
+def _get_manager_field(manager):
+    return getattr(manager, 'generic_m2m_field', None) or get_generic_m2m_field(manager.model)
+
+
+def _send_relation_signals(manager, pre_signal, post_signal, get_object_keys=None):
+    return _send_signals(
+        _get_manager_field(manager),
+        manager.instance,
+        get_write_db(manager),
+        pre_signal,
+        post_signal,
+        get_object_keys
+    )
+
+
+def _get_counted_field(manager):
+    field = getattr(manager, 'generic_m2m_field', None)
+    return field if field is not None and field.has_counters else None
+
+
+@contextmanager
+def _lock_parent(manager):
+    db = get_write_db(manager)
+    parent_db = router.db_for_write(type(manager.instance), instance=manager.instance)
+    with transaction.atomic(using=db), ExitStack() as stack:
+        if parent_db != db:
+            stack.enter_context(transaction.atomic(using=parent_db))
+        list(type(manager.instance)._base_manager.using(parent_db).select_for_update().filter(
+            pk=manager.instance.pk
+        ).values_list('pk'))
+        yield
+
+
+def _count_by_object_ct(qs):
+    return dict(qs.order_by().values('object_ct_id').annotate(count=Count('pk')).values_list('object_ct_id', 'count'))
+
+
+DELETE_CHUNK_SIZE = 900
+
+
+def _delete_relations(manager, qs):
+    field = getattr(manager, 'generic_m2m_field', None)
+    if field is None or not (field.has_counters or field.track_changes):
+        qs.delete()
+    else:
+        with _lock_parent(manager) if field.has_counters else transaction.atomic(using=get_write_db(manager)):
+            # Tombstones and counters are computed from the same rows which are deleted, rows added concurrently
+            # after the primary keys were read are kept
+            pks = list(qs.select_for_update().values_list('pk', flat=True))
+            for i in range(0, len(pks), DELETE_CHUNK_SIZE):
+                chunk_qs = qs.model._base_manager.using(qs.db).filter(pk__in=pks[i:i + DELETE_CHUNK_SIZE])
+                deltas = _count_by_object_ct(chunk_qs) if field.has_counters else {}
+                if field.track_changes:
+                    field.create_tombstones(chunk_qs)
+                chunk_qs.delete()
+                field.update_counters(
+                    manager.instance, {object_ct_id: -count for object_ct_id, count in deltas.items()}
+                )
+
+
+def _add_relations(manager, relations):
+    if not relations:
+        return
+
+    field = _get_counted_field(manager)
+    with _lock_parent(manager) if field is not None else nullcontext():
+        # Counters and signals contain only the relations which are really added
+        if field is not None or _has_signal_listeners(_get_manager_field(manager), pre_add, post_add):
+            for object_key in manager.filter(get_objects_q(relations)).values_list('object_ct_id', 'object_id'):
+                relations.pop(object_key, None)
+            if not relations:
+                return
+
+        with _send_relation_signals(manager, pre_add, post_add, lambda: list(relations)):
+            manager.model._default_manager.db_manager(get_write_db(manager)).bulk_create(
+                relations.values(), ignore_conflicts=True
+            )
+            if field is not None:
+                field.update_counters(manager.instance, Counter(object_ct_id for object_ct_id, _ in relations))
+
+
+def _remove_relations(manager, qs, get_object_keys):
+    with _send_relation_signals(manager, pre_remove, post_remove, get_object_keys):
+        _delete_relations(manager, qs)
+
+
+def _clear_relations(manager):
+    with _send_relation_signals(manager, pre_clear, post_clear):
+        _delete_relations(manager, manager.all())
+
+
 def add_objs(self, *objects):
-    for obj in objects:
-        object_ct_id, object_id = _get_object_ct_and_pk(obj)
-        self.get_or_create(
-            object_ct_id=object_ct_id,
-            object_id=object_id
-        )
+    batch = get_current_batch()
+    if batch is not None:
+        changes = batch.get_changes(self)
+        for obj in objects:
+            changes.add(_get_object_key(obj))
+        return
+
+    _add_relations(self, {_get_object_key(obj): _build_relation(self, obj) for obj in objects})
 
 
 def clear_objs(self):
-    self.all().delete()
+    batch = get_current_batch()
+    if batch is not None:
+        batch.get_changes(self).clear()
+        return
+
+    _clear_relations(self)
 
 
 def set_objs(self, *objects):
-    self.clear()
+    if get_current_batch() is None and objects:
+        removed_qs = self.exclude(get_objects_q(_get_object_key(obj) for obj in objects))
+        _remove_relations(self, removed_qs, lambda: removed_qs.values_list('object_ct_id', 'object_id'))
+    else:
+        self.clear()
     self.add(*objects)
 
 
 def remove_objs(self, *objects):
-    for obj in objects:
-        object_ct_id, object_id = _get_object_ct_and_pk(obj)
-        self.filter(
-            object_ct_id=object_ct_id,
-            object_id=object_id
-        ).delete()
+    batch = get_current_batch()
+    if batch is not None:
+        changes = batch.get_changes(self)
+        for obj in objects:
+            changes.remove(_get_object_key(obj))
+        return
+
+    if objects:
+        object_keys = [_get_object_key(obj) for obj in objects]
+        _remove_relations(self, self.filter(get_objects_q(object_keys)), lambda: object_keys)
+
+
+def _add_named_relations(manager, object_keys):
+    manager.model._default_manager.db_manager(get_write_db(manager)).bulk_create(
+        [_build_relation(manager, object_key, name=name) for name, object_key in object_keys.items()],
+        ignore_conflicts=True
+    )
+    # Relations which already existed with a different object are re-pointed with one update statement
+    manager.filter(reduce(or_, (
+        Q(name=name) & ~Q(object_ct_id=object_ct_id, object_id=object_id)
+        for name, (object_ct_id, object_id) in object_keys.items()
+    ))).update(
+        object_ct_id=Case(
+            *(When(name=name, then=Value(object_ct_id)) for name, (object_ct_id, _) in object_keys.items()),
+            output_field=models.IntegerField()
+        ),
+        object_id=Case(
+            *(When(name=name, then=Value(object_id)) for name, (_, object_id) in object_keys.items()),
+            output_field=models.TextField()
+        ),
+        changed_at=now()
+    )
 
 
 def add_named_objs(self, **objects):
-    for name, obj in objects.items():
-        object_ct_id, object_id = _get_object_ct_and_pk(obj)
-        self.update_or_create(
-            name=name,
-            defaults=dict(
-                object_ct_id=object_ct_id,
-                object_id=object_id
-            )
-        )
+    batch = get_current_batch()
+    if batch is not None:
+        changes = batch.get_changes(self, PendingNamedRelationChanges)
+        for name, obj in objects.items():
+            changes.add(name, _get_object_key(obj))
+        return
+
+    if not objects:
+        return
+
+    field = _get_counted_field(self)
+    object_keys = {name: _get_object_key(obj) for name, obj in objects.items()}
+    with _lock_parent(self) if field is not None else nullcontext():
+        deltas = Counter()
+        # Counters and signals contain only the names which are really added or re-pointed to another object
+        if field is not None or _has_signal_listeners(_get_manager_field(self), pre_add, post_add):
+            for name, object_ct_id, object_id in self.filter(name__in=object_keys).values_list(
+                    'name', 'object_ct_id', 'object_id'):
+                if object_keys[name] == (object_ct_id, object_id):
+                    del object_keys[name]
+                else:
+                    deltas[object_ct_id] -= 1
+            if not object_keys:
+                return
+
+        with _send_relation_signals(self, pre_add, post_add, lambda: object_keys):
+            _add_named_relations(self, object_keys)
+            if field is not None:
+                deltas.update(object_ct_id for object_ct_id, _ in object_keys.values())
+                field.update_counters(self.instance, deltas)
+
+
+def clear_named_objs(self):
+    batch = get_current_batch()
+    if batch is not None:
+        batch.get_changes(self, PendingNamedRelationChanges).clear()
+        return
+
+    _clear_relations(self)
 
 
 def set_named_objs(self, **objects):
-    self.clear()
+    if get_current_batch() is None and objects:
+        removed_qs = self.exclude(name__in=objects.keys())
+        _remove_relations(self, removed_qs, lambda: removed_qs.values_list('name', flat=True))
+    else:
+        self.clear()
     self.add(**objects)
 
 
 def remove_named_objs(self, *names):
-    self.filter(name__in=names).delete()
+    batch = get_current_batch()
+    if batch is not None:
+        changes = batch.get_changes(self, PendingNamedRelationChanges)
+        for name in names:
+            changes.remove(name)
+        return
+
+    if names:
+        _remove_relations(self, self.filter(name__in=names), lambda: names)
+
+
+def _validate_content_type_ids(db, model_classes):
+    content_type_names = {
+        ContentType.objects.get_for_model(model_class).pk: (model_class._meta.app_label, model_class._meta.model_name)
+        for model_class in model_classes
+    }
+    db_content_type_names = {
+        pk: (app_label, model)
+        for pk, app_label, model in ContentType.objects.db_manager(db).filter(
+            pk__in=content_type_names
+        ).values_list('pk', 'app_label', 'model')
+    }
+    for object_ct_id, content_type_name in content_type_names.items():
+        if db_content_type_names.get(object_ct_id) != content_type_name:
+            raise ValueError('Content type ID {} of model {} is different in the database "{}"'.format(
+                object_ct_id, '.'.join(content_type_name), db
+            ))
+
+
+def _get_multiple_db_object_keys(objects):
+    model_classes_by_db = {}
+    for obj in objects:
+        if isinstance(obj, models.Model) and obj._state.db:
+            model_classes_by_db.setdefault(obj._state.db, set()).add(type(obj))
+
+    # Content type IDs are stored without a foreign key, they must be the same in every database of related objects
+    content_type_db = router.db_for_read(ContentType)
+    for db, model_classes in model_classes_by_db.items():
+        if db != content_type_db and router.allow_migrate_model(db, ContentType):
+            _validate_content_type_ids(db, model_classes)
+    return [_get_object_key(obj) for obj in objects]
+
+
+def add_multiple_db_objs(self, *objects):
+    add_objs(self, *_get_multiple_db_object_keys(objects))
+
+
+def set_multiple_db_objs(self, *objects):
+    set_objs(self, *_get_multiple_db_object_keys(objects))
+
+
+def remove_multiple_db_objs(self, *objects):
+    remove_objs(self, *_get_multiple_db_object_keys(objects))
+
+
+def get_multiple_db_prefetch_queryset(self, instances, queryset=None):
+    field = get_generic_m2m_field(self.model)
+    if not field.using:
+        return type(self).get_prefetch_queryset(self, instances, queryset)
+
+    if queryset is None:
+        queryset = self.model._default_manager.all()
+    queryset = queryset.using(field.using).filter(**{'{}__in'.format(self.field.name): instances})
+    instances_by_pk = {self.field.get_foreign_related_value(instance): instance for instance in instances}
+    # Parents are stored in another database, therefore they are cached without the database router check
+    for related_object in queryset:
+        self.field.set_cached_value(related_object, instances_by_pk[self.field.get_local_related_value(related_object)])
+    return (
+        queryset,
+        self.field.get_local_related_value,
+        self.field.get_foreign_related_value,
+        False,
+        self.field.remote_field.get_cache_name(),
+        False,
+    )
+
+
+def get_object_pk_field(model_class):
+    pk_field = model_class._meta.pk
+    if isinstance(pk_field, models.AutoField):
+        pk_field = models.IntegerField()
+    return pk_field
+
+
+POSITION_STEP = 2 ** 16
+
+
+def _rebalance_positions(manager, exclude_object_key=None):
+    qs = manager.order_by('position', 'pk')
+    if exclude_object_key:
+        qs = qs.exclude(get_objects_q([exclude_object_key]))
+    related_objects = list(qs.only('pk', 'position'))
+    for i, related_object in enumerate(related_objects):
+        related_object.position = (i + 1) * POSITION_STEP
+    manager.model._default_manager.db_manager(get_write_db(manager)).bulk_update(related_objects, ('position',))
+
+
+def _get_position_at(manager, index, exclude_object_key=None, rebalance=True):
+    qs = manager.order_by('position', 'pk')
+    if exclude_object_key:
+        qs = qs.exclude(get_objects_q([exclude_object_key]))
+    if index > 0:
+        positions = list(qs.values_list('position', flat=True)[index - 1:index + 1]) or [
+            qs.values_list('position', flat=True).last()
+        ]
+        before, after = (positions + [None])[:2]
+    else:
+        before, after = None, qs.values_list('position', flat=True).first()
+
+    if after is None:
+        return (before or 0) + POSITION_STEP
+    elif before is None:
+        return after - POSITION_STEP
+    elif after - before > 1:
+        return (before + after) // 2
+    elif rebalance:
+        # The gap between neighbours is exhausted, the positions are renumbered once and the gap is restored
+        _rebalance_positions(manager, exclude_object_key)
+        return _get_position_at(manager, index, exclude_object_key, rebalance=False)
+    else:
+        raise ValueError('Position cannot be found')
+
+
+def add_ordered_objs(self, *objects):
+    if get_current_batch() is not None or not objects:
+        return add_objs(self, *objects)
+
+    # Concurrent appends to the same parent would read the same last position
+    with _lock_parent(self):
+        position = self.aggregate(max_position=Max('position'))['max_position'] or 0
+        _add_relations(self, {
+            _get_object_key(obj): _build_relation(self, obj, position=position + (i + 1) * POSITION_STEP)
+            for i, obj in enumerate(objects)
+        })
+
+
+def set_ordered_objs(self, *objects):
+    if get_current_batch() is not None or not objects:
+        return set_objs(self, *objects)
+
+    object_keys = [_get_object_key(obj) for obj in objects]
+    removed_qs = self.exclude(get_objects_q(object_keys))
+    _remove_relations(self, removed_qs, lambda: removed_qs.values_list('object_ct_id', 'object_id'))
+    _add_relations(self, {
+        object_key: _build_relation(self, object_key, position=(i + 1) * POSITION_STEP)
+        for i, object_key in enumerate(object_keys)
+    })
+    self.filter(get_objects_q(object_keys)).update(position=Case(
+        *(
+            When(get_objects_q([object_key]), then=Value((i + 1) * POSITION_STEP))
+            for i, object_key in enumerate(object_keys)
+        ),
+        output_field=models.BigIntegerField()
+    ))
+
+
+def _flush_batched_changes(manager):
+    # Positions are computed from the written relations, pending changes must precede them
+    batch = get_current_batch()
+    if batch is not None:
+        batch.flush_changes(manager)
+
+
+def move_ordered_obj(self, obj, index):
+    _flush_batched_changes(self)
+    object_key = _get_object_key(obj)
+    with _lock_parent(self):
+        if not self.filter(get_objects_q([object_key])).exists():
+            raise ValueError('Object {} is not related and cannot be moved'.format(object_key))
+        self.filter(get_objects_q([object_key])).update(
+            position=_get_position_at(self, index, object_key), changed_at=now()
+        )
+
+
+def insert_ordered_obj_at(self, index, obj):
+    _flush_batched_changes(self)
+    object_key = _get_object_key(obj)
+    with _lock_parent(self):
+        if self.filter(get_objects_q([object_key])).exists():
+            self.move(object_key, index)
+        else:
+            _add_relations(self, {
+                object_key: _build_relation(self, object_key, position=_get_position_at(self, index))
+            })
+
+
+def _encode_cursor(related_object):
+    return urlsafe_base64_encode('{}|{}'.format(related_object.created_at.isoformat(), related_object.pk).encode())
+
+
+def _decode_cursor(cursor):
+    try:
+        created_at, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        created_at, pk = parse_datetime(created_at), int(pk)
+    except (ValueError, TypeError):
+        created_at = None
+    if created_at is None:
+        raise ValueError('Invalid page cursor {}'.format(cursor))
+    return created_at, pk
+
+
+def _encode_change_token(changed_at, relation_pk, tombstone_pk):
+    return urlsafe_base64_encode('{}|{}|{}'.format(
+        changed_at.isoformat() if changed_at else '', relation_pk, tombstone_pk
+    ).encode())
+
+
+def _decode_change_token(token):
+    try:
+        changed_at, relation_pk, tombstone_pk = urlsafe_base64_decode(token).decode().split('|')
+        relation_pk, tombstone_pk = int(relation_pk), int(tombstone_pk)
+        parsed_changed_at = parse_datetime(changed_at) if changed_at else None
+    except (ValueError, TypeError):
+        raise ValueError('Invalid change token {}'.format(token))
+    if changed_at and parsed_changed_at is None:
+        raise ValueError('Invalid change token {}'.format(token))
+    return parsed_changed_at, relation_pk, tombstone_pk
+
+
+def _get_objects_in_bulk(model_class, object_pks, fields=None):
+    qs = model_class.objects.all()
+    if fields:
+        qs = qs.only(*fields)
+    objects = qs.in_bulk(object_pks)
+    return {object_pk: objects[object_pk] for object_pk in object_pks if object_pk in objects}
+
+
+def _resolve_object_keys(object_keys, fields=None):
+    fields = fields or {}
+    object_ids_by_ct_id = {}
+    for object_ct_id, object_id in object_keys:
+        object_ids_by_ct_id.setdefault(object_ct_id, []).append(object_id)
+
+    objects_by_key = {}
+    for object_ct_id, object_ids in object_ids_by_ct_id.items():
+        model_class = ContentType.objects.get_for_id(object_ct_id).model_class()
+        objects_by_key.update({
+            (object_ct_id, str(pk)): obj for pk, obj in _get_objects_in_bulk(
+                model_class,
+                [model_class._meta.pk.to_python(object_id) for object_id in object_ids],
+                fields.get(model_class)
+            ).items()
+        })
+    return objects_by_key
+
+
+def _cache_related_object(related_object, obj):
+    object_descriptor = getattr(type(related_object), 'object', None)
+    if isinstance(object_descriptor, GenericForeignKey):
+        if obj is not None:
+            object_descriptor.set_cached_value(related_object, obj)
+    else:
+        related_object.__dict__['object'] = obj
 
 
 class RelatedObjectQuerySet(SmartQuerySet):
 
     def annotate_object_pks(self, model_class):
-        pk_field = model_class._meta.pk
-        if isinstance(pk_field, models.AutoField):
-            pk_field = models.IntegerField()
         return self.filter(
             object_ct_id=ContentType.objects.get_for_model(model_class).pk
         ).annotate(
-            object_pk=Cast('object_id', output_field=pk_field)
+            object_pk=Cast('object_id', output_field=get_object_pk_field(model_class))
         )
 
     def get_object_or_none(self, model_class, pk=None):
@@ -96,12 +585,96 @@ class RelatedObjectQuerySet(SmartQuerySet):
         related_object = self.filter(name=name).first()
         return related_object.object if related_object else None
 
-    def get_objects(self, model_class):
-        return model_class.objects.filter(pk__in=self.annotate_object_pks(model_class).values('object_pk'))
+    def get_objects(self, model_class, fields=None):
+        qs = model_class.objects.filter(pk__in=self.annotate_object_pks(model_class).values('object_pk'))
+        return qs.only(*fields) if fields else qs
 
     def get_object_pks(self, model_class):
         return self.annotate_object_pks(model_class).values_list('object_pk', flat=True)
 
+    def refs(self):
+        refs = []
+        for object_ct_id, object_id in self.values_list('object_ct_id', 'object_id'):
+            model_class = ContentType.objects.get_for_id(object_ct_id).model_class()
+            refs.append(RelatedObjectRef(model_class._meta.label, model_class._meta.pk.to_python(object_id)))
+        return refs
+
+    def get_object_pks_map(self, *model_classes):
+        model_classes_by_ct_id = {
+            ct.pk: model_class for model_class, ct in ContentType.objects.get_for_models(*model_classes).items()
+        }
+        object_pks_map = {model_class: [] for model_class in model_classes}
+        for object_ct_id, object_id in self.filter(
+                object_ct_id__in=model_classes_by_ct_id.keys()).values_list('object_ct_id', 'object_id'):
+            model_class = model_classes_by_ct_id[object_ct_id]
+            object_pks_map[model_class].append(model_class._meta.pk.to_python(object_id))
+        return object_pks_map
+
+    def get_objects_map(self, *model_classes, fields=None):
+        fields = fields or {}
+        return {
+            model_class: list(_get_objects_in_bulk(model_class, object_pks, fields.get(model_class)).values())
+            for model_class, object_pks in self.get_object_pks_map(*model_classes).items()
+        }
+
+    def resolve_objects(self, fields=None):
+        related_objects = list(self)
+        objects_by_key = _resolve_object_keys(
+            ((related_object.object_ct_id, related_object.object_id) for related_object in related_objects), fields
+        )
+        resolved_objects = []
+        for related_object in related_objects:
+            obj = objects_by_key.get((related_object.object_ct_id, related_object.object_id))
+            _cache_related_object(related_object, obj)
+            resolved_objects.append((related_object, obj))
+        return resolved_objects
+
+    def _get_linked_object_keys(self, object_keys):
+        if self._result_cache is not None:
+            return {
+                (related_object.object_ct_id, related_object.object_id) for related_object in self._result_cache
+            } & set(object_keys)
+        else:
+            return set(self.filter(get_objects_q(object_keys)).values_list('object_ct_id', 'object_id'))
+
+    def contains(self, obj):
+        object_key = _get_object_key(obj)
+        if self._result_cache is not None:
+            return object_key in self._get_linked_object_keys([object_key])
+        return self.filter(get_objects_q([object_key])).exists()
+
+    def contains_many(self, *objects):
+        if not objects:
+            return set()
+        object_keys = [_get_object_key(obj) for obj in objects]
+        linked_object_keys = self._get_linked_object_keys(object_keys)
+        return {obj for obj, object_key in zip(objects, object_keys) if object_key in linked_object_keys}
+
+    def copy_to(self, *parents):
+        get_generic_m2m_field(self.model).copy_relations(self, parents)
+
+    def count_by_model(self):
+        return {
+            ContentType.objects.get_for_id(object_ct_id).model_class(): count
+            for object_ct_id, count in _count_by_object_ct(self).items()
+        }
+
+    def page(self, after=None, limit=20, model_classes=None, fields=None):
+        if limit < 1:
+            raise ValueError('Page limit must be at least 1')
+
+        qs = self
+        if model_classes:
+            qs = qs.filter(object_ct_id__in=[
+                ct.pk for ct in ContentType.objects.get_for_models(*model_classes).values()
+            ])
+        if after is not None:
+            created_at, pk = _decode_cursor(after)
+            qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        items = qs.order_by('-created_at', '-pk')[:limit + 1].resolve_objects(fields)
+        next_cursor = _encode_cursor(items[limit - 1][0]) if len(items) > limit else None
+        return RelatedObjectPage(items[:limit], next_cursor)
+
     def _filter_by_object(self, kwargs):
         if 'object' in kwargs:
             object = kwargs.pop('object')
@@ -136,6 +709,31 @@ class GenericManyToManyManager(BaseGenericManager):
             self.remove = MethodType(remove_objs, self)
 
 
+class MultipleDBGenericManyToManyManager(BaseGenericManager):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self._is_related_manager():
+            self.add = MethodType(add_multiple_db_objs, self)
+            self.set = MethodType(set_multiple_db_objs, self)
+            self.clear = MethodType(clear_objs, self)
+            self.remove = MethodType(remove_multiple_db_objs, self)
+            self.get_prefetch_queryset = MethodType(get_multiple_db_prefetch_queryset, self)
+
+
+class OrderedGenericManyToManyManager(BaseGenericManager):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self._is_related_manager():
+            self.add = MethodType(add_ordered_objs, self)
+            self.set = MethodType(set_ordered_objs, self)
+            self.clear = MethodType(clear_objs, self)
+            self.remove = MethodType(remove_objs, self)
+            self.move = MethodType(move_ordered_obj, self)
+            self.insert_at = MethodType(insert_ordered_obj_at, self)
+
+
 class NamedGenericManyToManyManager(BaseGenericManager):
 
     def __init__(self, *args, **kwargs):
@@ -143,7 +741,7 @@ class NamedGenericManyToManyManager(BaseGenericManager):
         if self._is_related_manager():
             self.add = MethodType(add_named_objs, self)
             self.set = MethodType(set_named_objs, self)
-            self.clear = MethodType(clear_objs, self)
+            self.clear = MethodType(clear_named_objs, self)
             self.remove = MethodType(remove_named_objs, self)
 
     def __getattr__(self, attr):
@@ -153,11 +751,11 @@ class NamedGenericManyToManyManager(BaseGenericManager):
                 return related_object.object
         raise AttributeError
 
-    def to_dict(self):
+    def to_dict(self, fields=None):
         if 'instance' in self.__dict__:
             return {
-                related_object.name: related_object.object
-                for related_object in self.all()
+                related_object.name: obj
+                for related_object, obj in self.all().resolve_objects(fields)
             }
         raise AttributeError
 
@@ -209,7 +807,7 @@ class MultipleDBGenericManyToMany(SmartModel):
         abstract = True
         unique_together = ('object_ct_id', 'object_id')
 
-    objects = GenericManyToManyManager.from_queryset(RelatedObjectQuerySet)()
+    objects = MultipleDBGenericManyToManyManager.from_queryset(RelatedObjectQuerySet)()
 
     @cached_property
     def object_ct(self):
@@ -237,24 +835,87 @@ class NamedGenericManyToMany(GenericManyToMany):
         unique_together = ('name',)
 
 
+class OrderedGenericManyToMany(GenericManyToMany):
+
+    position = models.BigIntegerField(
+        verbose_name=_('position'),
+        null=False,
+        blank=False,
+        default=0
+    )
+
+    objects = OrderedGenericManyToManyManager.from_queryset(RelatedObjectQuerySet)()
+
+    class Meta:
+        abstract = True
+        unique_together = ('object_ct', 'object_id')
+
+
+class GenericManyToManyTombstone(SmartModel):
+
+    id = models.BigAutoField(
+        primary_key=True
+    )
+    field = models.CharField(
+        verbose_name=_('generic many to many field'),
+        null=False,
+        blank=False,
+        max_length=255
+    )
+    parent_id = models.TextField(
+        verbose_name=_('ID of the parent object'),
+        null=False,
+        blank=False
+    )
+    object_ct_id = models.PositiveIntegerField(
+        verbose_name=_('content type of the related object'),
+        null=False,
+        blank=False
+    )
+    object_id = models.TextField(
+        verbose_name=_('ID of the related object'),
+        null=False,
+        blank=False
+    )
+    name = models.CharField(
+        verbose_name=_('name'),
+        null=True,
+        blank=True,
+        max_length=200
+    )
+
+    class Meta:
+        verbose_name = _('removed generic many to many relation')
+        verbose_name_plural = _('removed generic many to many relations')
+        index_together = (('field', 'id'),)
+
+
 def create_generic_many_to_many_intermediary_model(field, klass, parent_through):
     from_name = camel_to_snake(klass.__name__).lower()
 
     name = '{}GenericManyToManyRelation'.format(klass._meta.object_name)
+    meta_options = field.get_through_meta_options(from_name)
+    object_ct_field_name = next(f.name for f in parent_through._meta.fields if f.attname == 'object_ct_id')
     meta = type('Meta', (), {
         'app_label': klass._meta.app_label,
         'db_tablespace': klass._meta.db_tablespace,
         'unique_together': (from_name,) + parent_through.Meta.unique_together,
         'apps': field.model._meta.apps,
+        **meta_options,
+        # Relations of a related object are found without the parent (e.g. aggregations or retargeting)
+        'index_together': ((object_ct_field_name, 'object_id'),) + tuple(meta_options.get('index_together', ())),
     })
     return type(name, (parent_through,), {
         'Meta': meta,
         '__module__': klass.__module__,
         from_name: models.ForeignKey(
             klass,
-            on_delete=models.CASCADE,
             related_name='_{}'.format(field.name),
-            related_query_name=field.name
+            **{
+                'on_delete': models.CASCADE,
+                'related_query_name': field.name,
+                **field.get_through_parent_field_options()
+            }
         ),
     })
 
@@ -275,15 +936,360 @@ class GenericManyToManyFieldDescriptor:
         if instance is None:
             return self
 
-        return getattr(instance, '_{}'.format(self.field.name))
+        manager = getattr(instance, '_{}'.format(self.field.name))
+        if self.field.using:
+            manager._db = self.field.using
+        manager.generic_m2m_field = self.field
+        return manager
+
+
+def get_generic_m2m_fields():
+    return [
+        attr.field
+        for model in apps.get_models()
+        for attr in vars(model).values()
+        if isinstance(attr, GenericManyToManyFieldDescriptor)
+    ]
+
+
+def retarget_many(pairs, chunk_size=1000):
+    pairs = list(pairs)
+    return {field.label: field.retarget(pairs, chunk_size) for field in get_generic_m2m_fields()}
+
+
+def retarget(old_obj, new_obj, chunk_size=1000):
+    return retarget_many([(old_obj, new_obj)], chunk_size)
+
+
+def get_generic_m2m_field(through):
+    for field in get_generic_m2m_fields():
+        if field.through is through:
+            return field
+    raise LookupError('Model {} is not a through model of a generic many to many field'.format(through._meta.label))
 
 
 class GenericManyToManyField:
 
     parent_through = GenericManyToMany
+    using = None
 
-    def __init__(self, through=None):
+    def __init__(self, through=None, count_field=None, model_count_fields=None, track_changes=False):
         self.through = through
+        self.count_field = count_field
+        self.model_count_fields = model_count_fields or {}
+        self.track_changes = track_changes
+
+    @property
+    def label(self):
+        return '{}.{}'.format(self.model._meta.label, self.name)
+
+    @cached_property
+    def parent_field(self):
+        return getattr(self.model, '_{}'.format(self.name)).field
+
+    @cached_property
+    def is_named(self):
+        return any(field.name == 'name' for field in self.through._meta.fields)
+
+    def get_through_meta_options(self, from_name):
+        return {}
+
+    def get_through_parent_field_options(self):
+        return {}
+
+    def get_db_for_read(self):
+        return self.using or router.db_for_read(self.through)
+
+    def get_db_for_write(self):
+        return self.using or router.db_for_write(self.through)
+
+    @property
+    def has_counters(self):
+        return bool(self.count_field or self.model_count_fields)
+
+    def get_model_count_fields(self):
+        return {
+            ContentType.objects.get_for_model(
+                apps.get_model(model) if isinstance(model, str) else model
+            ).pk: count_field
+            for model, count_field in self.model_count_fields.items()
+        }
+
+    def update_counters(self, instance, deltas):
+        changed_counters = {}
+        total_delta = sum(deltas.values())
+        if self.count_field and total_delta:
+            changed_counters[self.count_field] = F(self.count_field) + total_delta
+        for object_ct_id, count_field in self.get_model_count_fields().items():
+            if deltas.get(object_ct_id):
+                changed_counters[count_field] = F(count_field) + deltas[object_ct_id]
+        if changed_counters:
+            self.model._base_manager.filter(pk=instance.pk).update(**changed_counters)
+
+    def recompute_counters(self, queryset=None, chunk_size=1000):
+        queryset = (self.model._base_manager.all() if queryset is None else queryset).order_by('pk')
+        parent_field_name = self.parent_field.name
+        counted_filters = {self.count_field: {}} if self.count_field else {}
+        counted_filters.update({
+            count_field: {'object_ct_id': object_ct_id}
+            for object_ct_id, count_field in self.get_model_count_fields().items()
+        })
+        count_expressions = {
+            count_field: Coalesce(Subquery(
+                self.through._base_manager.filter(
+                    **{parent_field_name: OuterRef('pk')}, **filters
+                ).order_by().values(parent_field_name).annotate(count=Count('pk')).values('count')
+            ), 0)
+            for count_field, filters in counted_filters.items()
+        }
+
+        recomputed = 0
+        last_pk = None
+        while True:
+            chunk_qs = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            pks = list(chunk_qs.values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                return recomputed
+            with transaction.atomic(using=queryset.db):
+                recomputed += self.model._base_manager.using(queryset.db).filter(pk__in=pks).update(
+                    **count_expressions
+                )
+            last_pk = pks[-1]
+
+    def top_targets(self, model=None, limit=10, fields=None):
+        qs = self.through._base_manager.using(self.using)
+        if model is not None:
+            qs = qs.filter(object_ct_id=ContentType.objects.get_for_model(model).pk)
+        top_object_keys = list(
+            qs.order_by().values('object_ct_id', 'object_id').annotate(
+                count=Count('pk')
+            ).order_by('-count', 'object_ct_id', 'object_id').values_list('object_ct_id', 'object_id', 'count')[:limit]
+        )
+        objects_by_key = _resolve_object_keys(
+            ((object_ct_id, object_id) for object_ct_id, object_id, _count in top_object_keys), fields
+        )
+        return [
+            (objects_by_key[(object_ct_id, object_id)], count)
+            for object_ct_id, object_id, count in top_object_keys
+            if (object_ct_id, object_id) in objects_by_key
+        ]
+
+    def copy_relations(self, qs, parents):
+        db = self.get_db_for_write()
+        copied_at = now()
+        with transaction.atomic(using=db):
+            for parent in parents:
+                with _send_signals(
+                        self, parent, db, pre_add, post_add, lambda: self._get_copied_object_keys(qs, parent, db)):
+                    self._copy_relations_to_parent(qs, parent, db, copied_at)
+            if self.has_counters:
+                self.recompute_counters(self.model._base_manager.using(db).filter(pk__in=[p.pk for p in parents]))
+
+    def _get_copied_object_keys(self, qs, parent, db):
+        # Relations which the parent already has are skipped by the insert
+        key_fields = ('name',) if self.is_named else ('object_ct_id', 'object_id')
+        return set(qs.using(db).order_by().values_list(*key_fields, flat=self.is_named)) - set(
+            self.through._base_manager.using(db).filter(**{self.parent_field.attname: parent.pk}).values_list(
+                *key_fields, flat=self.is_named
+            )
+        )
+
+    def _copy_relations_to_parent(self, qs, parent, db, copied_at):
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+        columns, copied_values = [], {}
+        for field in self.through._meta.concrete_fields:
+            if field.primary_key:
+                continue
+            elif field == self.parent_field:
+                value = Cast(Value(parent.pk), output_field=self.parent_field.target_field)
+            elif field.name in {'created_at', 'changed_at'}:
+                value = Cast(Value(copied_at), output_field=field)
+            elif field.name == 'position':
+                # Copied relations keep their order and are placed after the relations of the parent
+                value = F(field.attname) + Coalesce(Subquery(
+                    self.through._base_manager.filter(**{self.parent_field.attname: parent.pk}).order_by(
+                        '-position'
+                    ).values('position')[:1]
+                ), 0)
+            else:
+                value = F(field.attname)
+            columns.append(quote_name(field.column))
+            copied_values['copied_{}'.format(field.attname)] = value
+
+        select_sql, params = qs.using(db).order_by().annotate(**copied_values).values_list(
+            *copied_values
+        ).query.get_compiler(using=db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '{} {} ({}) {} {}'.format(
+                    connection.ops.insert_statement(ignore_conflicts=True),
+                    quote_name(self.through._meta.db_table),
+                    ', '.join(columns),
+                    select_sql,
+                    connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+                ),
+                params
+            )
+
+    def clone_relations(self, source_parent, *parents):
+        self.copy_relations(
+            self.through._base_manager.filter(**{self.parent_field.name: source_parent}),
+            parents
+        )
+
+    def retarget(self, pairs, chunk_size=1000):
+        db = self.get_db_for_write()
+        parent_attname = self.parent_field.attname
+        updated = deleted = 0
+        for old_obj, new_obj in pairs:
+            old_object_key, new_object_key = _get_object_key(old_obj), _get_object_key(new_obj)
+            if old_object_key == new_object_key:
+                continue
+            old_relations_qs = self.through._base_manager.using(db).filter(get_objects_q([old_object_key]))
+            while True:
+                with transaction.atomic(using=db):
+                    chunk = list(old_relations_qs.order_by('pk').values_list('pk', parent_attname)[:chunk_size])
+                    if not chunk:
+                        break
+                    chunk_qs = self.through._base_manager.using(db).filter(pk__in=[pk for pk, _ in chunk])
+                    with ExitStack() as stack:
+                        self._send_retarget_signals(stack, chunk_qs, db, old_object_key, new_object_key)
+                        chunk_updated, chunk_deleted = self._retarget_chunk(chunk_qs, new_object_key)
+                    updated += chunk_updated
+                    deleted += chunk_deleted
+                    if self.has_counters:
+                        self.recompute_counters(
+                            self.model._base_manager.using(db).filter(pk__in={parent_pk for _, parent_pk in chunk})
+                        )
+        return RetargetResult(updated, deleted)
+
+    def _get_retarget_duplicates_qs(self, chunk_qs, new_object_key):
+        # Parent objects which are already related with the new object would have duplicate rows
+        new_object_ct_id, new_object_id = new_object_key
+        return chunk_qs.filter(**{
+            '{}__in'.format(self.parent_field.attname): self.through._base_manager.filter(
+                object_ct_id=new_object_ct_id, object_id=new_object_id
+            ).values(self.parent_field.attname)
+        })
+
+    def _send_retarget_signals(self, stack, chunk_qs, db, old_object_key, new_object_key):
+        if not _has_signal_listeners(self, pre_add, post_add, pre_remove, post_remove):
+            return
+
+        parent_attname = self.parent_field.attname
+        if self.is_named:
+            # Named relations keep their names, only the objects behind the names are replaced
+            object_keys_by_parent_pk = {}
+            for parent_pk, name in chunk_qs.order_by().values_list(parent_attname, 'name'):
+                object_keys_by_parent_pk.setdefault(parent_pk, set()).add(name)
+        else:
+            # Relations of parents which already have the new object are only removed
+            duplicate_parent_pks = set(
+                self._get_retarget_duplicates_qs(chunk_qs, new_object_key).values_list(parent_attname, flat=True)
+            )
+            object_keys_by_parent_pk = {
+                parent_pk: set() if parent_pk in duplicate_parent_pks else {new_object_key}
+                for parent_pk in chunk_qs.order_by().values_list(parent_attname, flat=True)
+            }
+        parents = self.model._base_manager.using(db).in_bulk(list(object_keys_by_parent_pk))
+        for parent_pk, object_keys in object_keys_by_parent_pk.items():
+            if not self.is_named:
+                stack.enter_context(_send_signals(
+                    self, parents[parent_pk], db, pre_remove, post_remove, lambda: {old_object_key}
+                ))
+            stack.enter_context(_send_signals(
+                self, parents[parent_pk], db, pre_add, post_add, lambda object_keys=object_keys: object_keys
+            ))
+
+    def _retarget_chunk(self, chunk_qs, new_object_key):
+        new_object_ct_id, new_object_id = new_object_key
+        deleted = 0
+        if not self.is_named:
+            duplicates_qs = self._get_retarget_duplicates_qs(chunk_qs, new_object_key)
+            if self.track_changes:
+                self.create_tombstones(duplicates_qs)
+            deleted = duplicates_qs.delete()[0]
+            if self.track_changes:
+                # Re-pointed relations are reported as updates with the new object, the relation with
+                # the old object is removed from the point of view of the change feed
+                self.create_tombstones(chunk_qs)
+        updated = chunk_qs.update(object_ct_id=new_object_ct_id, object_id=new_object_id, changed_at=now())
+        return updated, deleted
+
+    def create_tombstones(self, qs):
+        value_fields = (self.parent_field.attname, 'object_ct_id', 'object_id') + (('name',) if self.is_named else ())
+        # Tombstones are written in the transaction of the deleted relations
+        GenericManyToManyTombstone.objects.using(self.get_db_for_write()).bulk_create([
+            GenericManyToManyTombstone(
+                field=self.label,
+                parent_id=values[0],
+                object_ct_id=values[1],
+                object_id=values[2],
+                name=values[3] if self.is_named else None
+            )
+            for values in qs.order_by().values_list(*value_fields)
+        ])
+
+    def _get_relation_change(self, related_object, since):
+        return RelationChange(
+            'insert' if since is None or related_object.created_at > since else 'update',
+            getattr(related_object, self.parent_field.attname),
+            related_object.object_ct_id,
+            related_object.object_id,
+            related_object.name if self.is_named else None,
+            related_object.changed_at,
+        )
+
+    def _get_tombstone_change(self, tombstone):
+        return RelationChange(
+            'delete',
+            self.parent_field.target_field.to_python(tombstone.parent_id),
+            tombstone.object_ct_id,
+            tombstone.object_id,
+            tombstone.name,
+            tombstone.created_at,
+        )
+
+    def changes_since(self, token=None, limit=1000, lag=None):
+        since, relation_pk, tombstone_pk = _decode_change_token(token) if token else (None, 0, 0)
+        changed_at = since
+
+        db = self.get_db_for_read()
+        relations_qs = self.through._base_manager.using(db).order_by('changed_at', 'pk')
+        if since is not None:
+            relations_qs = relations_qs.filter(Q(changed_at__gt=since) | Q(changed_at=since, pk__gt=relation_pk))
+        tombstones_qs = GenericManyToManyTombstone.objects.using(db).filter(
+            field=self.label, pk__gt=tombstone_pk
+        ).order_by('pk')
+
+        tombstones = list(tombstones_qs[:limit])
+        if lag is not None:
+            # Changes of transactions committed later than the lag are not read before they are visible
+            changed_before = now() - lag
+            relations_qs = relations_qs.filter(changed_at__lte=changed_before)
+            # Tombstones are read by primary key, the first recent tombstone stops reading to not skip older ones
+            tombstones = list(takewhile(lambda tombstone: tombstone.created_at <= changed_before, tombstones))
+        relations = list(relations_qs[:limit])
+
+        # Both streams are merged by time and read from their heads, therefore the consumed changes of every stream
+        # are its prefix and the token contains the last consumed position of both streams
+        changes = []
+        relation_index = tombstone_index = 0
+        while len(changes) < limit and (relation_index < len(relations) or tombstone_index < len(tombstones)):
+            if tombstone_index == len(tombstones) or (
+                    relation_index < len(relations)
+                    and relations[relation_index].changed_at <= tombstones[tombstone_index].created_at):
+                related_object = relations[relation_index]
+                relation_index += 1
+                changes.append(self._get_relation_change(related_object, since))
+                changed_at, relation_pk = related_object.changed_at, related_object.pk
+            else:
+                tombstone = tombstones[tombstone_index]
+                tombstone_index += 1
+                changes.append(self._get_tombstone_change(tombstone))
+                tombstone_pk = tombstone.pk
+        return RelationChangesPage(changes, _encode_change_token(changed_at, relation_pk, tombstone_pk))
 
     def contribute_to_class(self, cls, name, **kwargs):
         self.model = cls
@@ -296,7 +1302,39 @@ class MultipleDBGenericManyToManyField(GenericManyToManyField):
 
     parent_through = MultipleDBGenericManyToMany
 
+    def __init__(self, *args, using=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.using = using
+
+    def get_through_parent_field_options(self):
+        # Parent table is not in the dedicated database of the through table, therefore relations cannot be joined
+        # with parents and they are deleted by the post_delete signal of the parent model instead of the collector
+        return {'db_constraint': False, 'on_delete': models.DO_NOTHING, 'related_query_name': '+'} if self.using else {}
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if self.using:
+            models.signals.post_delete.connect(self._delete_parent_relations, sender=cls, weak=False)
+
+    def _delete_parent_relations(self, sender, instance, **kwargs):
+        qs = self.through._base_manager.using(self.using).filter(**{self.parent_field.attname: instance.pk})
+        with transaction.atomic(using=self.using):
+            if self.track_changes:
+                self.create_tombstones(qs)
+            qs.delete()
+
 
 class NamedGenericManyToManyField(GenericManyToManyField):
 
     parent_through = NamedGenericManyToMany
+
+
+class OrderedGenericManyToManyField(GenericManyToManyField):
+
+    parent_through = OrderedGenericManyToMany
+
+    def get_through_meta_options(self, from_name):
+        return {
+            'ordering': ('position', 'pk'),
+            'index_together': ((from_name, 'position'),),
+        }
@@ -0,0 +1,129 @@
+from django.db import models
+from django.db.backends.utils import truncate_name
+from django.db.migrations.operations.base import Operation
+
+from generic_m2m_field.models import get_object_pk_field
+
+
+class PartitionGenericManyToManyRelations(Operation):
+
+    reversible = False
+    reduces_to_sql = False
+
+    def __init__(self, model_name, partitioned_models):
+        self.model_name = model_name
+        self.partitioned_models = partitioned_models
+
+    def deconstruct(self):
+        return (
+            self.__class__.__name__,
+            [],
+            {
+                'model_name': self.model_name,
+                'partitioned_models': self.partitioned_models,
+            }
+        )
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def _get_partition_name(self, schema_editor, model, partition_suffix):
+        return truncate_name(
+            '{}_{}'.format(model._meta.db_table, partition_suffix), schema_editor.connection.ops.max_name_length()
+        )
+
+    def _get_model_partition_suffix(self, model_class):
+        # Models with the same name can be in several apps
+        return '{}_{}'.format(model_class._meta.app_label, model_class._meta.model_name)
+
+    def get_partition_sql(self, schema_editor, model, partitioned_models, serial_sequence=None):
+        quote_name = schema_editor.quote_name
+        table = model._meta.db_table
+        old_table = truncate_name('{}_old'.format(table), schema_editor.connection.ops.max_name_length())
+        object_ct_column = model._meta.get_field('object_ct_id').column
+        for unique_together in model._meta.unique_together:
+            if not {'object_ct', 'object_ct_id'} & set(unique_together):
+                raise ValueError(
+                    'Relations of the model {} cannot be partitioned by content type because the unique '
+                    'constraint {} does not contain it'.format(model._meta.label, unique_together)
+                )
+
+        statements = [
+            'ALTER TABLE {} RENAME TO {}'.format(quote_name(table), quote_name(old_table)),
+            'CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS) PARTITION BY LIST ({})'.format(
+                quote_name(table), quote_name(old_table), quote_name(object_ct_column)
+            ),
+        ]
+        for object_ct_id, model_class in partitioned_models:
+            partition = self._get_partition_name(schema_editor, model, self._get_model_partition_suffix(model_class))
+            statements.append('CREATE TABLE {} PARTITION OF {} FOR VALUES IN ({})'.format(
+                quote_name(partition), quote_name(table), int(object_ct_id)
+            ))
+            pk_field = get_object_pk_field(model_class)
+            if isinstance(pk_field, (models.IntegerField, models.UUIDField)):
+                statements.append('CREATE INDEX {} ON {} (({}::{}))'.format(
+                    quote_name(self._get_partition_name(schema_editor, model, '{}_pk'.format(
+                        self._get_model_partition_suffix(model_class)
+                    ))),
+                    quote_name(partition),
+                    quote_name(model._meta.get_field('object_id').column),
+                    pk_field.cast_db_type(schema_editor.connection),
+                ))
+        statements += [
+            'CREATE TABLE {} PARTITION OF {} DEFAULT'.format(
+                quote_name(self._get_partition_name(schema_editor, model, 'default')), quote_name(table)
+            ),
+            'INSERT INTO {} SELECT * FROM {}'.format(quote_name(table), quote_name(old_table)),
+        ]
+        if serial_sequence:
+            statements.append('ALTER SEQUENCE {} OWNED BY {}.{}'.format(
+                serial_sequence, quote_name(table), quote_name(model._meta.pk.column)
+            ))
+        statements += [
+            'DROP TABLE {}'.format(quote_name(old_table)),
+            'ALTER TABLE {} ADD PRIMARY KEY ({}, {})'.format(
+                quote_name(table), quote_name(model._meta.pk.column), quote_name(object_ct_column)
+            ),
+        ]
+        statements += [
+            str(schema_editor._create_unique_sql(
+                model, [model._meta.get_field(field_name).column for field_name in unique_together]
+            ))
+            for unique_together in model._meta.unique_together
+        ]
+        statements += [str(statement) for statement in schema_editor._model_indexes_sql(model)]
+        if schema_editor.sql_create_fk:
+            statements += [
+                str(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+                for field in model._meta.local_fields
+                if field.remote_field and field.db_constraint
+            ]
+        return statements
+
+    def _get_partitioned_models(self, from_state, schema_editor):
+        content_type_model = from_state.apps.get_model('contenttypes', 'ContentType')
+        partitioned_models = []
+        for model_label in self.partitioned_models:
+            model_class = from_state.apps.get_model(model_label)
+            content_type, _ = content_type_model.objects.using(schema_editor.connection.alias).get_or_create(
+                app_label=model_class._meta.app_label, model=model_class._meta.model_name
+            )
+            partitioned_models.append((content_type.pk, model_class))
+        return partitioned_models
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if schema_editor.connection.vendor != 'postgresql' or not self.allow_migrate_model(
+                schema_editor.connection.alias, model):
+            return
+
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [model._meta.db_table, model._meta.pk.column])
+            serial_sequence = cursor.fetchone()[0]
+
+        for statement in self.get_partition_sql(
+                schema_editor, model, self._get_partitioned_models(from_state, schema_editor), serial_sequence):
+            schema_editor.execute(statement, params=None)
+
+    def describe(self):
+        return 'Partition relations of {} by content type'.format(self.model_name)
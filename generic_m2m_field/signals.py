@@ -0,0 +1,12 @@
+from django.dispatch import Signal
+
+
+# Signals are sent once per call of the related manager method with arguments sender (the through model), instance
+# (the parent object), field, object_keys (frozenset of (content type ID, object ID) pairs, names for named fields
+# or None for clear) and using
+pre_add = Signal()
+post_add = Signal()
+pre_remove = Signal()
+post_remove = Signal()
+pre_clear = Signal()
+post_clear = Signal()
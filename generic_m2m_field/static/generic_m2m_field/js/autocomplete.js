@@ -0,0 +1,46 @@
+(function() {
+    'use strict';
+
+    var timeouts = {};
+
+    function getDatalist(input) {
+        var datalist = document.getElementById(input.id + '_autocomplete');
+        if (!datalist) {
+            datalist = document.createElement('datalist');
+            datalist.id = input.id + '_autocomplete';
+            input.parentNode.appendChild(datalist);
+            input.setAttribute('list', datalist.id);
+        }
+        return datalist;
+    }
+
+    function search(input) {
+        var request = new XMLHttpRequest();
+        request.open('GET', input.dataset.autocompleteUrl + '?term=' + encodeURIComponent(input.value));
+        request.onload = function() {
+            if (request.status !== 200) {
+                return;
+            }
+            var datalist = getDatalist(input);
+            datalist.innerHTML = '';
+            JSON.parse(request.responseText).results.forEach(function(result) {
+                var option = document.createElement('option');
+                option.value = result.id;
+                option.textContent = result.model + ': ' + result.text;
+                datalist.appendChild(option);
+            });
+        };
+        request.send();
+    }
+
+    document.addEventListener('input', function(event) {
+        var input = event.target;
+        if (!input.dataset || !input.dataset.autocompleteUrl || !input.value) {
+            return;
+        }
+        clearTimeout(timeouts[input.id]);
+        timeouts[input.id] = setTimeout(function() {
+            search(input);
+        }, 300);
+    });
+})();
@@ -0,0 +1,23 @@
+from functools import reduce
+from operator import or_
+
+from django.db import router
+from django.db.models import Q
+
+
+def get_objects_q(object_keys):
+    object_ids_by_ct_id = {}
+    for object_ct_id, object_id in object_keys:
+        object_ids_by_ct_id.setdefault(object_ct_id, set()).add(str(object_id))
+    return reduce(or_, (
+        Q(object_ct_id=object_ct_id, object_id__in=object_ids) if len(object_ids) > 1
+        else Q(object_ct_id=object_ct_id, object_id=next(iter(object_ids)))
+        for object_ct_id, object_ids in object_ids_by_ct_id.items()
+    ))
+
+
+def get_write_db(manager):
+    field = getattr(manager, 'generic_m2m_field', None)
+    if field is not None and field.using:
+        return field.using
+    return router.db_for_write(manager.model, instance=manager.instance)